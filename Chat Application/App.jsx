@@ -899,12 +899,12 @@ function ChatView({ token, user, room, onlineUsers, toast }) {
   const [participants, setParticipants] = useState([]);
   const [searchOpen, setSearchOpen] = useState(false);
   const [membersOpen, setMembersOpen] = useState(true);
-  const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(false);
   const [loadingMore, setLoadingMore] = useState(false);
   const [sending, setSending] = useState(false);
 
   const sseRef = useRef(null);
+  const lastEventId = useRef(null);  // resume point for SSE reconnects
   const messagesEndRef = useRef(null);
   const inputRef = useRef(null);
   const typingTimeout = useRef(null);
@@ -915,16 +915,20 @@ function ChatView({ token, user, room, onlineUsers, toast }) {
   useEffect(() => {
     if (!room) return;
     setMessages([]);
-    setPage(1);
-    loadMessages(1, true);
+    lastEventId.current = null;
+    loadMessages(null, true);
     loadParticipants();
     connectSSE();
     return () => { sseRef.current?.close(); };
   }, [room?.room_id]);
 
-  const loadMessages = async (p = 1, reset = false) => {
+  // `before` is the oldest message already shown; null loads the newest page.
+  const loadMessages = async (before = null, reset = false) => {
     try {
-      const res = await api.get(`/api/rooms/${room.room_id}/messages?page=${p}`, token);
+      const cursor = !before ? ""
+        : before.seq != null ? `&before_seq=${before.seq}`
+        : `&before=${encodeURIComponent(before.message_id)}`;
+      const res = await api.get(`/api/rooms/${room.room_id}/messages?limit=50${cursor}`, token);
       const msgs = res.messages || [];
       setMessages((prev) => reset ? msgs : [...msgs, ...prev]);
       setHasMore(res.has_more);
@@ -940,29 +944,41 @@ function ChatView({ token, user, room, onlineUsers, toast }) {
 
   const connectSSE = () => {
     sseRef.current?.close();
-    const es = new EventSource(`${SSE_BASE}/sse/${room.room_id}?token=${token}`);
+    const resume = lastEventId.current ? `&last_event_id=${lastEventId.current}` : "";
+    const es = new EventSource(`${SSE_BASE}/sse/${room.room_id}?token=${token}${resume}`);
     es.onmessage = (e) => {
+      if (e.lastEventId) lastEventId.current = e.lastEventId;
       const data = JSON.parse(e.data);
-      if (data.type === "new_message") {
-        setMessages((prev) => [...prev, data.message]);
+      if (data.type === "resync") {
+        // Missed events are no longer buffered server-side — reload.
+        loadMessages(null, true);
+        loadParticipants();
+      } else if (data.type === "new_message") {
+        // After a resync the reloaded page may already contain this message.
+        setMessages((prev) => prev.some((m) => m.message_id === data.message.message_id)
+          ? prev : [...prev, data.message]);
         setTimeout(() => messagesEndRef.current?.scrollIntoView({ behavior: "smooth" }), 50);
       } else if (data.type === "message_deleted") {
         setMessages((prev) => prev.filter((m) => m.message_id !== data.message_id));
-      } else if (data.type === "typing") {
-        const typer = data.username;
-        if (typer === user.username) return;
-        if (data.is_typing) {
+      } else if (data.type === "typing_snapshot") {
+        // Server re-announces active typers every ~2s; the timer only
+        // clears someone whose stop signal was lost.
+        const typers = data.typing.filter((u) => u !== user.username);
+        typers.forEach((typer) => {
           clearTimeout(typingUsers_ref.current[typer]);
           typingUsers_ref.current[typer] = setTimeout(() => {
             setTypingUsers((prev) => prev.filter((u) => u !== typer));
             delete typingUsers_ref.current[typer];
-          }, 3000);
-          setTypingUsers((prev) => prev.includes(typer) ? prev : [...prev, typer]);
-        } else {
+          }, 4000);
+        });
+        data.stopped.forEach((typer) => {
           clearTimeout(typingUsers_ref.current[typer]);
           delete typingUsers_ref.current[typer];
-          setTypingUsers((prev) => prev.filter((u) => u !== typer));
-        }
+        });
+        setTypingUsers((prev) => [
+          ...prev.filter((u) => !data.stopped.includes(u) && !typers.includes(u)),
+          ...typers,
+        ]);
       } else if (data.type === "user_joined" || data.type === "user_left") {
         loadParticipants();
       }
@@ -984,8 +1000,9 @@ function ChatView({ token, user, room, onlineUsers, toast }) {
 
   const handleInput = (e) => {
     setInput(e.target.value);
-    if (!isTyping.current) {
-      isTyping.current = true;
+    // Re-send while typing continuously so the server-side entry doesn't expire.
+    if (!isTyping.current || Date.now() - isTyping.current > 3000) {
+      isTyping.current = Date.now();
       sendTypingEvent(true);
     }
     clearTimeout(typingTimeout.current);
@@ -1032,9 +1049,7 @@ function ChatView({ token, user, room, onlineUsers, toast }) {
   const handleScroll = async (e) => {
     if (e.target.scrollTop === 0 && hasMore && !loadingMore) {
       setLoadingMore(true);
-      const nextPage = page + 1;
-      setPage(nextPage);
-      await loadMessages(nextPage, false);
+      await loadMessages(messages[0], false);
       setLoadingMore(false);
     }
   };
@@ -1237,31 +1252,37 @@ export default function App() {
     setTimeout(() => setToasts((prev) => prev.filter((t) => t.id !== id)), 3500);
   }, []);
 
-  // Load rooms & online users on auth
+  // Rooms & online users: delta sync against the server's change journal
+  const syncVersion = useRef(0);
   useEffect(() => {
     if (!token) return;
-    const load = async () => {
-      try {
-        const [rRes, oRes] = await Promise.all([
-          api.get("/api/rooms", token),
-          api.get("/api/users/online", token),
-        ]);
-        setRooms(rRes.rooms || []);
-        setOnlineUsers((oRes.users || []).map((u) => u.username));
-      } catch {
-        handleLogout();
-      }
+    syncVersion.current = 0;
+    const sync = async () => {
+      const res = await api.get(`/api/sync?since=${syncVersion.current}`, token);
+      if (res.version === syncVersion.current) return;
+      syncVersion.current = res.version;
+      setRooms((prev) => {
+        const byId = new Map(res.full ? [] : prev.map((r) => [r.room_id, r]));
+        res.rooms.forEach((r) => byId.set(r.room_id, r));
+        res.rooms_removed.forEach((id) => byId.delete(id));
+        return [...byId.values()];
+      });
+      setOnlineUsers((prev) => {
+        const online = new Set(res.full ? [] : prev);
+        res.online.forEach((u) => online.add(u.username));
+        res.offline.forEach((name) => online.delete(name));
+        return [...online];
+      });
     };
-    load();
+    sync().catch(() => handleLogout());
 
-    // Poll online users & notifications
+    // Poll sync & notifications
     const interval = setInterval(async () => {
       try {
-        const [oRes, nRes] = await Promise.all([
-          api.get("/api/users/online", token),
+        const [, nRes] = await Promise.all([
+          sync(),
           api.get("/api/users/notifications", token),
         ]);
-        setOnlineUsers((oRes.users || []).map((u) => u.username));
         setNotifCount(nRes.notifications?.length || 0);
       } catch {}
     }, 5000);
@@ -1293,7 +1314,7 @@ export default function App() {
   };
 
   const handleRoomCreated = (room) => {
-    setRooms((prev) => [...prev, room]);
+    setRooms((prev) => [...prev.filter((r) => r.room_id !== room.room_id), room]);
     handleRoomSelect(room);
     addToast(`Room "${room.name}" created!`, "success");
   };
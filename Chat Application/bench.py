@@ -0,0 +1,417 @@
+"""
+NEXUS CHAT — fan-out benchmark
+Starts the server, opens N SSE subscribers spread over M rooms, drives K
+senders through POST /api/rooms/<id>/messages and measures how long each
+message takes to reach every subscriber of its room.
+
+  python bench.py --subscribers 500 --rooms 10 --senders 8 --rate 20 --duration 30
+  python bench.py --async-sse --out results/async.json
+  python bench.py --url http://localhost:8000 --pid 1234   # already running
+
+Every message carries the sender's perf_counter() timestamp; subscribers
+live in this process too, so latency is measured on one clock. Written
+to --out as JSON:
+
+  latency_ms        p50 / p90 / p99 / p999 / max / mean send → receive
+  delivered_per_sec subscriber deliveries per second of the run
+  delivery_ratio    deliveries / (sent × subscribers in the room)
+  dropped           subscribers whose stream ended before the run did
+  resyncs           resync events (the server shed a subscriber's backlog)
+  server            CPU % and peak RSS of the server process (Linux /proc)
+  sse_stats         the server's own /api/stats "sse" section at the end
+
+Standard library only.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import asyncio
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# ─────────────────────────────────────────────
+# HTTP HELPERS
+# ─────────────────────────────────────────────
+class Api:
+    """Keep-alive JSON client; one per thread."""
+
+    def __init__(self, base, token=None):
+        url = urlsplit(base)
+        self._conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+        self.token = token
+
+    def call(self, method, path, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = json.dumps(body).encode() if body is not None else None
+        for attempt in (1, 2):
+            try:
+                self._conn.request(method, path, data, headers)
+                res = self._conn.getresponse()
+                payload = res.read()
+                return res.status, (json.loads(payload) if payload else None)
+            except (http.client.HTTPException, ConnectionError):
+                self._conn.close()   # stale keep-alive socket; retry once
+                if attempt == 2:
+                    raise
+
+    def login(self, username):
+        self.call("POST", "/api/auth/register",
+                  {"username": username, "password": "bench-pass", "display_name": username})
+        status, body = self.call("POST", "/api/auth/login",
+                                 {"username": username, "password": "bench-pass"})
+        if status != 200:
+            raise RuntimeError(f"login failed for {username}: {body}")
+        self.token = body["token"]
+        return self.token
+
+
+def wait_ready(base, server=None, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server and server.poll() is not None:
+            raise RuntimeError(f"server exited with status {server.returncode}")
+        try:
+            if Api(base).call("GET", "/api/stats")[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base} did not come up within {timeout}s")
+
+
+# ─────────────────────────────────────────────
+# SERVER PROCESS
+# ─────────────────────────────────────────────
+def start_server(port, sse_port, async_sse):
+    env = {**os.environ, "PORT": str(port), "SSE_PORT": str(sse_port)}
+    cmd = [sys.executable, os.path.join(HERE, "main.py")]
+    if async_sse:
+        cmd.append("--async-sse")
+    # Request logging goes nowhere: an unread pipe would fill and stall it.
+    return subprocess.Popen(cmd, cwd=HERE, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+class ProcSampler(threading.Thread):
+    """CPU and RSS of one pid from /proc, sampled every `interval`."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu = []
+        self.rss_peak = 0
+        self._done = threading.Event()
+
+    def _times(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def _rss(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def run(self):
+        try:
+            last_cpu, last_t = self._times(), time.monotonic()
+            while not self._done.wait(self.interval):
+                cpu, now = self._times(), time.monotonic()
+                self.cpu.append(100 * (cpu - last_cpu) / (now - last_t))
+                last_cpu, last_t = cpu, now
+                self.rss_peak = max(self.rss_peak, self._rss())
+        except OSError:
+            pass   # no /proc (not Linux) or the process is gone
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def summary(self):
+        if not self.cpu:
+            return None
+        return {
+            "cpu_percent_mean": round(sum(self.cpu) / len(self.cpu), 1),
+            "cpu_percent_max": round(max(self.cpu), 1),
+            "rss_peak_mb": round(self.rss_peak / 2**20, 1),
+        }
+
+
+# ─────────────────────────────────────────────
+# SUBSCRIBERS — one coroutine each
+# ─────────────────────────────────────────────
+class Subscriber:
+    def __init__(self, room_id, token):
+        self.room_id = room_id
+        self.token = token
+        self.latencies = []
+        self.resyncs = 0
+        self.connected = asyncio.Event()
+        self.dropped = False
+
+    async def run(self, sse_base, stop, tag):
+        url = urlsplit(sse_base)
+        try:
+            reader, writer = await asyncio.open_connection(url.hostname, url.port)
+        except OSError:
+            self.dropped = True
+            self.connected.set()
+            return
+        # HTTP/1.0 keeps the body unchunked on both transports.
+        writer.write(f"GET /sse/{self.room_id}?token={self.token} HTTP/1.0\r\n"
+                     f"Host: {url.netloc}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if b" 200 " not in head.split(b"\r\n", 1)[0]:
+                raise ConnectionError(head.split(b"\r\n", 1)[0].decode())
+            self.connected.set()
+            while not stop.is_set():
+                line = await reader.readline()
+                if not line:
+                    raise ConnectionError("stream closed")
+                if line.startswith(b"data: "):
+                    self._on_event(json.loads(line[6:]), tag)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            self.dropped = not stop.is_set()
+        finally:
+            self.connected.set()
+            writer.close()
+
+    def _on_event(self, event, tag):
+        now = time.perf_counter()
+        kind = event.get("type")
+        if kind == "new_message":
+            content = event["message"].get("content", "")
+            if content.startswith(tag):
+                self.latencies.append(now - float(content.rsplit(" ", 1)[1]))
+        elif kind == "resync":
+            self.resyncs += 1
+
+
+def run_subscribers(subs, sse_base, tag, ready, loop_box, connect_rate):
+    async def main():
+        loop_box.append(asyncio.get_running_loop())
+        stop_event = asyncio.Event()
+        loop_box.append(stop_event)
+        tasks = []
+        for i, sub in enumerate(subs):
+            tasks.append(asyncio.create_task(sub.run(sse_base, stop_event, tag)))
+            if connect_rate and i % connect_rate == connect_rate - 1:
+                await asyncio.sleep(1)   # don't SYN-flood the listen backlog
+        await asyncio.gather(*(s.connected.wait() for s in subs))
+        ready.set()
+        await stop_event.wait()
+        await asyncio.sleep(0.5)          # let in-flight events land
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+# ─────────────────────────────────────────────
+# SENDERS — one thread each, fixed rate
+# ─────────────────────────────────────────────
+def run_sender(api, rooms, rate, deadline, tag, stats):
+    interval = 1 / rate if rate else 0
+    next_at = time.perf_counter()
+    i = 0
+    while time.perf_counter() < deadline:
+        room_id = rooms[i % len(rooms)]
+        i += 1
+        try:
+            status, _ = api.call("POST", f"/api/rooms/{room_id}/messages",
+                                 {"content": f"{tag} {time.perf_counter()}"})
+            ok = status == 200
+        except OSError:
+            ok = False
+        with stats["lock"]:
+            if ok:
+                stats["sent"][room_id] = stats["sent"].get(room_id, 0) + 1
+            else:
+                stats["errors"] += 1
+        if interval:
+            next_at += interval
+            time.sleep(max(0, next_at - time.perf_counter()))
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return {
+        "p50": round(pick(0.50), 3),
+        "p90": round(pick(0.90), 3),
+        "p99": round(pick(0.99), 3),
+        "p999": round(pick(0.999), 3),
+        "max": round(values[-1] * 1000, 3),
+        "mean": round(sum(values) / len(values) * 1000, 3),
+        "count": len(values),
+    }
+
+
+# ─────────────────────────────────────────────
+# DRIVER
+# ─────────────────────────────────────────────
+def bench(args):
+    server = None
+    if args.url:
+        base = args.url.rstrip("/")
+        sse_base = (args.sse_url or base).rstrip("/")
+        pid = args.pid
+    else:
+        server = start_server(args.port, args.sse_port, args.async_sse)
+        base = f"http://127.0.0.1:{args.port}"
+        sse_base = f"http://127.0.0.1:{args.sse_port if args.async_sse else args.port}"
+        pid = server.pid
+    try:
+        wait_ready(base, server)
+        run_id = uuid.uuid4().hex[:6]
+        tag = f"bench-{run_id}"
+
+        print(f"setting up {args.rooms} rooms, {args.subscribers} subscribers, {args.senders} senders")
+        owner = Api(base)
+        owner.login(f"bo{run_id}")
+        rooms = []
+        for r in range(args.rooms):
+            status, body = owner.call("POST", "/api/rooms", {"name": f"{tag}-{r}", "description": "bench"})
+            rooms.append(body["room"]["room_id"])
+
+        subs = []
+        for i in range(args.subscribers):
+            api = Api(base)
+            subs.append(Subscriber(rooms[i % len(rooms)], api.login(f"bs{run_id}{i}")))
+        senders = []
+        for i in range(args.senders):
+            api = Api(base)
+            api.login(f"bk{run_id}{i}")
+            for room_id in rooms:
+                api.call("POST", f"/api/rooms/{room_id}/join")
+            senders.append(api)
+
+        ready, loop_box = threading.Event(), []
+        sub_thread = threading.Thread(
+            target=run_subscribers,
+            args=(subs, sse_base, tag, ready, loop_box, args.connect_rate),
+            daemon=True,
+        )
+        sub_thread.start()
+        if not ready.wait(max(60, args.subscribers / max(args.connect_rate, 1) + 30)):
+            raise RuntimeError("subscribers did not connect in time")
+        connected = sum(not s.dropped for s in subs)
+        print(f"{connected}/{len(subs)} subscribers connected; sending for {args.duration}s")
+
+        sampler = ProcSampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+        stats = {"lock": threading.Lock(), "sent": {}, "errors": 0}
+        started = time.perf_counter()
+        deadline = started + args.duration
+        threads = [
+            threading.Thread(target=run_sender,
+                             args=(api, rooms[i % len(rooms):] + rooms[:i % len(rooms)],
+                                   args.rate, deadline, tag, stats), daemon=True)
+            for i, api in enumerate(senders)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        time.sleep(args.drain)
+        elapsed = time.perf_counter() - started
+
+        loop, stop_event = loop_box
+        loop.call_soon_threadsafe(stop_event.set)
+        sub_thread.join(10)
+        if sampler:
+            sampler.stop()
+        try:
+            sse_stats = Api(base).call("GET", "/api/stats")[1].get("sse")
+        except OSError:
+            sse_stats = None
+
+        latencies = [l for s in subs for l in s.latencies]
+        per_room = {}
+        for s in subs:
+            if not s.dropped:
+                per_room[s.room_id] = per_room.get(s.room_id, 0) + 1
+        expected = sum(n * per_room.get(r, 0) for r, n in stats["sent"].items())
+        sent = sum(stats["sent"].values())
+        return {
+            "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "elapsed_s": round(elapsed, 3),
+            "sent": sent,
+            "send_errors": stats["errors"],
+            "sent_per_sec": round(sent / elapsed, 1),
+            "delivered": len(latencies),
+            "expected": expected,
+            "delivered_per_sec": round(len(latencies) / elapsed, 1),
+            "delivery_ratio": round(len(latencies) / expected, 4) if expected else None,
+            "latency_ms": percentiles(latencies),
+            "subscribers_connected": connected,
+            "dropped": sum(s.dropped for s in subs),
+            "resyncs": sum(s.resyncs for s in subs),
+            "server": sampler.summary() if sampler else None,
+            "sse_stats": sse_stats,
+        }
+    finally:
+        if server:
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nexus Chat SSE fan-out benchmark")
+    parser.add_argument("--subscribers", "-n", type=int, default=200)
+    parser.add_argument("--rooms", "-m", type=int, default=10)
+    parser.add_argument("--senders", "-k", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=10, help="messages/sec per sender; 0 = as fast as possible")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of sending")
+    parser.add_argument("--drain", type=float, default=2, help="seconds to wait for stragglers")
+    parser.add_argument("--connect-rate", type=int, default=500, help="subscriber connects per second")
+    parser.add_argument("--async-sse", action="store_true", help="serve /sse/* from the asyncio transport")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--sse-port", type=int, default=8101)
+    parser.add_argument("--url", help="benchmark a server that is already running")
+    parser.add_argument("--sse-url", help="SSE base URL when it differs from --url")
+    parser.add_argument("--pid", type=int, help="server pid to sample when using --url")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    result = bench(args)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    lat = result["latency_ms"] or {}
+    print(f"sent {result['sent']} ({result['send_errors']} errors), "
+          f"delivered {result['delivered']}/{result['expected']} "
+          f"({result['delivered_per_sec']}/s), dropped {result['dropped']}, "
+          f"resyncs {result['resyncs']}")
+    print(f"latency ms  p50 {lat.get('p50')}  p99 {lat.get('p99')}  max {lat.get('max')}")
+    if result["server"]:
+        print(f"server cpu {result['server']['cpu_percent_mean']}% mean, "
+              f"rss {result['server']['rss_peak_mb']} MB peak")
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
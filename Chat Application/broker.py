@@ -0,0 +1,122 @@
+"""
+NEXUS CHAT — broadcast backends
+SSEManager publishes every event through a backend, and the backend hands
+it back to each process's local subscribers through `deliver`.
+
+  LocalBackend   — single process; deliver immediately (the default)
+  SQLiteBackend  — several workers or nodes sharing one SQLite file
+                   (set CHAT_BROKER_DB=/path/to/broker.db)
+
+With SQLite the event id is the table's rowid, so every worker stamps the
+same event with the same id and Last-Event-ID resume works no matter which
+worker a client reconnects to.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+
+class LocalBackend:
+    """In-process fan-out — what SSEManager always did."""
+
+    def start(self, deliver):
+        """Bind the delivery callback and return the first event id this
+        process will see; anything older is not in its replay buffer.
+        Seeded from the clock so ids keep growing across restarts."""
+        self._deliver = deliver
+        return time.time_ns() // 1000
+
+    def publish(self, room_id, data, exclude=None, key=None):
+        # No id: SSEManager numbers local events itself.
+        self._deliver(room_id, data, exclude, key)
+
+
+class SQLiteBackend:
+    """Shared append-only event table in a WAL-mode SQLite file.
+
+    publish() is one INSERT; a poller thread in every process tails the
+    table by rowid and delivers new rows locally. A publisher wakes its own
+    poller immediately, other processes see the row within POLL_INTERVAL.
+    Rows older than RETENTION seconds are pruned by whichever poller gets
+    there first.
+    """
+
+    POLL_INTERVAL = 0.05
+    RETENTION     = 300
+    BATCH         = 1000
+
+    def __init__(self, path):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._conn = self._connect()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id       INTEGER PRIMARY KEY AUTOINCREMENT,
+                room_id  TEXT NOT NULL,
+                exclude  TEXT,
+                coalesce TEXT,
+                data     TEXT NOT NULL,
+                created  REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_events_created ON events(created);
+        """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False,
+                               isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start(self, deliver):
+        self._deliver = deliver
+        row = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+        self._last_id = row[0]
+        threading.Thread(target=self._poll_forever, name="sse-broker", daemon=True).start()
+        return self._last_id + 1
+
+    def publish(self, room_id, data, exclude=None, key=None):
+        with self._write_lock:
+            self._conn.execute(
+                "INSERT INTO events (room_id, exclude, coalesce, data, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (room_id, exclude, key, data, time.time()),
+            )
+        self._wakeup.set()
+
+    def _poll_forever(self):
+        conn = self._connect()
+        last_prune = time.monotonic()
+        while True:
+            self._wakeup.wait(self.POLL_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self._poll(conn)
+                if time.monotonic() - last_prune > self.RETENTION / 10:
+                    last_prune = time.monotonic()
+                    with self._write_lock:
+                        self._conn.execute("DELETE FROM events WHERE created < ?",
+                                           (time.time() - self.RETENTION,))
+            except sqlite3.OperationalError:
+                time.sleep(self.POLL_INTERVAL)   # locked/busy — try next tick
+
+    def _poll(self, conn):
+        while True:
+            rows = conn.execute(
+                "SELECT id, room_id, exclude, coalesce, data FROM events "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (self._last_id, self.BATCH),
+            ).fetchall()
+            for (event_id, room_id, exclude, key, data) in rows:
+                self._deliver(room_id, data, exclude, key, event_id)
+                self._last_id = event_id
+            if len(rows) < self.BATCH:
+                return
+
+
+def backend_from_env():
+    path = os.getenv("CHAT_BROKER_DB")
+    return SQLiteBackend(path) if path else LocalBackend()
@@ -2,10 +2,16 @@
 NEXUS CHAT — Flask Backend
 Uses Server-Sent Events (SSE) for real-time push (server→client).
 Zero extra dependencies beyond Flask (already installed).
+
+  python main.py              → API + SSE on :8000 (one thread per stream)
+  python main.py --async-sse  → API on :8000, SSE on :8001 via asyncio
+                                (point SSE_BASE in App.jsx at :8001)
+
+PORT / SSE_PORT override the default ports.
 """
 
 import time
-import json
+from datetime import datetime, timezone
 import threading
 import queue as stdlib_queue
 import sys, os
@@ -14,54 +20,76 @@ sys.path.insert(0, os.path.dirname(__file__))
 from flask import Flask, request, jsonify, Response, stream_with_context
 from core.engine import engine
 from core.data_structures import HashMap
+from session_cache import sessions
+from search_index import search_index
+from sync_journal import journal
+import metrics
+from message_log import open_from_env
+from streams import (
+    sse, SSE_HEADERS, PING, PING_INTERVAL,
+    connected_event, stream_encoder, open_stream, close_stream, heartbeat,
+    post_typing,
+)
 
 app = Flask(__name__)
+metrics.instrument(engine)
+message_log = open_from_env()   # on disk if CHAT_LOG_DIR is set, else memory-only
+
+message_log.seed(engine)        # rooms the log has not seen yet
+
+if message_log.root:
+    # History now outlives the engine; index it without delaying startup.
+    threading.Thread(target=search_index.load_log, args=(message_log,), daemon=True).start()
+else:
+    search_index.load_log(message_log)
 
 # ─────────────────────────────────────────────
-# SSE CONNECTION MANAGER
+# METRICS
 # ─────────────────────────────────────────────
-class SSEManager:
-    def __init__(self):
-        self._lock = threading.Lock()
-        self._room_clients = {}  # room_id -> list of (username, queue)
-
-    def subscribe(self, room_id, username):
-        q = stdlib_queue.Queue(maxsize=100)
-        with self._lock:
-            if room_id not in self._room_clients:
-                self._room_clients[room_id] = []
-            self._room_clients[room_id].append((username, q))
-        return q
-
-    def unsubscribe(self, room_id, username, q):
-        with self._lock:
-            clients = self._room_clients.get(room_id, [])
-            try:
-                clients.remove((username, q))
-            except ValueError:
-                pass
-
-    def broadcast(self, room_id, event_data, exclude=None):
-        payload = f"data: {json.dumps(event_data)}\n\n"
-        with self._lock:
-            clients = list(self._room_clients.get(room_id, []))
-        dead = []
-        for (uname, q) in clients:
-            if uname == exclude:
-                continue
-            try:
-                q.put_nowait(payload)
-            except stdlib_queue.Full:
-                dead.append((uname, q))
-        if dead:
-            with self._lock:
-                for item in dead:
-                    try:
-                        self._room_clients.get(room_id, []).remove(item)
-                    except ValueError:
-                        pass
-
-sse = SSEManager()
+@app.before_request
+def start_timer():
+    metrics.begin_request()
+
+@app.after_request
+def record_timing(response):
+    elapsed, engine_time, engine_calls = metrics.end_request()
+    if elapsed is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.http_seconds.observe(elapsed, request.method, route, response.status_code)
+        if metrics.SERVER_TIMING:
+            response.headers["Server-Timing"] = metrics.server_timing(elapsed, engine_time, engine_calls)
+    return response
+
+@metrics.registry.collector
+def sse_metrics():
+    rooms = sse.stats()
+    lines = metrics.render_samples(
+        "nexus_sse_subscribers", "gauge", "Open event streams per room.",
+        [((r,), s["subscribers"]) for r, s in rooms.items()], ("room",))
+    for counter, help in (("coalesced", "Queued events replaced by a newer one."),
+                          ("dropped", "Queued events shed by backpressure."),
+                          ("resyncs", "Subscribers told to resync after overflowing.")):
+        lines += metrics.render_samples(
+            f"nexus_sse_{counter}_total", "counter", help,
+            [((r,), s[counter]) for r, s in rooms.items()], ("room",))
+    return lines
+
+@metrics.registry.collector
+def auth_cache_metrics():
+    stats = sessions.stats()
+    lines = []
+    for counter in ("hits", "misses", "evictions"):
+        lines += metrics.render_samples(
+            f"nexus_auth_cache_{counter}_total", "counter", f"Session cache {counter}.",
+            [((), stats[counter])])
+    lines += metrics.render_samples(
+        "nexus_auth_cache_hit_ratio", "gauge", "Session cache hits / lookups.",
+        [((), stats["hit_rate"])])
+    return lines
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
 
 # ─────────────────────────────────────────────
 # CORS
@@ -85,7 +113,7 @@ def get_current_user():
     auth = request.headers.get("Authorization", "")
     if not auth.startswith("Bearer "):
         return None
-    return engine.get_user_by_token(auth.split(" ", 1)[1])
+    return sessions.get(auth.split(" ", 1)[1])
 
 def require_user():
     user = get_current_user()
@@ -112,7 +140,9 @@ def login():
 def logout():
     auth = request.headers.get("Authorization","")
     if auth.startswith("Bearer "):
-        engine.logout(auth.split(" ",1)[1])
+        token = auth.split(" ",1)[1]
+        engine.logout(token)
+        sessions.invalidate(token)
     return jsonify({"ok": True})
 
 # ─────────────────────────────────────────────
@@ -132,9 +162,17 @@ def get_notifications():
     if err: return err, code
     return jsonify({"notifications": engine.get_notifications(user.username)})
 
+@app.route("/api/sync")
+def sync():
+    """Rooms and presence changed since ?since=<version>; 0 or absent
+    returns everything. O(1) when nothing changed."""
+    user, err, code = require_user()
+    if err: return err, code
+    return jsonify(journal.since(request.args.get("since", 0, type=int)))
+
 @app.route("/api/stats")
 def stats():
-    return jsonify(engine.stats())
+    return jsonify({**engine.stats(), "sse": sse.stats(), "auth_cache": sessions.stats()})
 
 # ─────────────────────────────────────────────
 # ROOM ROUTES
@@ -150,13 +188,18 @@ def create_room():
     user, err, code = require_user()
     if err: return err, code
     data = request.json or {}
-    return jsonify(engine.create_room(data.get("name",""), data.get("description",""), user.username))
+    result = engine.create_room(data.get("name",""), data.get("description",""), user.username)
+    if result.get("ok"):
+        journal.touch_room(result["room"]["room_id"])
+    return jsonify(result)
 
 @app.route("/api/rooms/<room_id>/join", methods=["POST"])
 def join_room(room_id):
     user, err, code = require_user()
     if err: return err, code
     result = engine.join_room(room_id, user.username)
+    if result["ok"]:
+        journal.touch_room(room_id)
     return jsonify(result), (404 if not result["ok"] else 200)
 
 @app.route("/api/rooms/<room_id>/leave", methods=["POST"])
@@ -164,6 +207,7 @@ def leave_room(room_id):
     user, err, code = require_user()
     if err: return err, code
     engine.leave_room(room_id, user.username)
+    journal.touch_room(room_id)
     return jsonify({"ok": True})
 
 @app.route("/api/rooms/<room_id>/participants")
@@ -179,9 +223,50 @@ def get_participants(room_id):
 def get_messages(room_id):
     user, err, code = require_user()
     if err: return err, code
-    page = int(request.args.get("page", 1))
-    result = engine.get_messages(room_id, page=page)
-    return jsonify(result), (404 if not result["ok"] else 200)
+    if not message_log.has_room(room_id):
+        result = engine.get_messages(room_id, page=int(request.args.get("page", 1)))
+        return jsonify(result), (404 if not result["ok"] else 200)
+    if "page" in request.args:
+        return jsonify(message_log.page_number(room_id, page=int(request.args["page"])))
+
+    # Cursor paging: ?before_seq=<seq> / ?after_seq=<seq> / newest. The
+    # older ?before= / ?after=<message_id> still work while that message
+    # is in the log's recent window.
+    # Validators are O(1), so an unchanged room answers 304 without a read.
+    version, modified = message_log.version(room_id)
+    etag = f"{room_id}-{version}"
+    if request.if_none_match.contains(etag) or (
+        not request.if_none_match and request.if_modified_since
+        and int(modified) <= request.if_modified_since.timestamp()
+    ):
+        response = Response(status=304)
+    else:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 100)
+        try:
+            before = _cursor_seq(room_id, "before")
+            after  = _cursor_seq(room_id, "after")
+        except ValueError:
+            return jsonify({"ok": False, "error": "Unknown cursor"}), 400
+        result = message_log.page(room_id, before, after, limit)
+        if result is None:
+            return jsonify({"ok": False, "error": "Unknown cursor"}), 400
+        response = jsonify(result)
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def _cursor_seq(room_id, name):
+    """The seq for ?<name>_seq=, or for the legacy ?<name>=<message_id>."""
+    if f"{name}_seq" in request.args:
+        return int(request.args[f"{name}_seq"])
+    message_id = request.args.get(name)
+    if message_id is None:
+        return None
+    seq = message_log.seq_for(room_id, message_id)
+    if seq is None:
+        raise ValueError(message_id)
+    return seq
 
 @app.route("/api/rooms/<room_id>/messages", methods=["POST"])
 def send_message(room_id):
@@ -192,6 +277,8 @@ def send_message(room_id):
     if not result["ok"]: return jsonify(result), 400
     msg = result["message"]
     msg["avatar_color"] = user.avatar_color
+    msg = result["message"] = message_log.append(room_id, msg)
+    search_index.add(room_id, msg)
     sse.broadcast(room_id, {"type": "new_message", "message": msg})
     return jsonify(result)
 
@@ -201,6 +288,8 @@ def undo_message(room_id):
     if err: return err, code
     result = engine.undo_last_message(room_id, user.username)
     if not result["ok"]: return jsonify(result), 400
+    message_log.delete(room_id, result["message_id"])
+    search_index.remove(room_id, result["message_id"])
     sse.broadcast(room_id, {"type": "message_deleted", "message_id": result["message_id"]})
     return jsonify(result)
 
@@ -208,70 +297,64 @@ def undo_message(room_id):
 def search_messages(room_id):
     user, err, code = require_user()
     if err: return err, code
-    return jsonify(engine.search_messages(room_id, request.args.get("q","")))
+    page = max(int(request.args.get("page", 1)), 1)
+    per_page = min(max(int(request.args.get("per_page", 20)), 1), 100)
+    return jsonify(search_index.search(room_id, request.args.get("q",""), page, per_page))
 
 # ─────────────────────────────────────────────
 # SSE ENDPOINT — real-time event stream
 # ─────────────────────────────────────────────
 @app.route("/sse/<room_id>")
 def sse_stream(room_id):
-    token = request.args.get("token","")
-    user = engine.get_user_by_token(token)
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    user, q = open_stream(room_id, request.args.get("token",""), last_event_id=last_event_id)
     if not user:
         return jsonify({"error": "Unauthorized"}), 401
-
     username = user.username
-    engine.set_online(username)
-    engine.join_room(room_id, username)
-    q = sse.subscribe(room_id, username)
-
-    sse.broadcast(room_id, {
-        "type": "user_joined",
-        "username": username,
-        "display_name": user.display_name,
-        "avatar_color": user.avatar_color,
-    }, exclude=username)
+    extra_headers, encode = stream_encoder(request.headers.get("Accept-Encoding"))
 
     def generate():
-        yield f"data: {json.dumps({'type': 'connected', 'username': username})}\n\n"
+        yield encode(connected_event(username))
         try:
             while True:
                 try:
-                    msg = q.get(timeout=25)
-                    yield msg
+                    # One yield (one socket write) per burst, not per event.
+                    yield encode(q.drain(timeout=PING_INTERVAL))
                 except stdlib_queue.Empty:
-                    yield f"data: {json.dumps({'type': 'ping'})}\n\n"
-        except GeneratorExit:
+                    yield encode(PING)
+                heartbeat(q)
+        except (GeneratorExit, ConnectionResetError):
+            # ConnectionResetError: presence expired the stream (no heartbeat).
             pass
         finally:
-            sse.unsubscribe(room_id, username, q)
-            engine.set_offline(username)
-            sse.broadcast(room_id, {"type": "user_left", "username": username})
+            close_stream(room_id, username, q)
 
     return Response(
         stream_with_context(generate()),
         mimetype="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-        }
+        headers={**SSE_HEADERS, **extra_headers},
     )
 
 @app.route("/sse/<room_id>/typing", methods=["POST"])
 def typing_event(room_id):
-    auth = request.headers.get("Authorization","")
-    if auth.startswith("Bearer "):
-        user = engine.get_user_by_token(auth.split(" ",1)[1])
-        if user:
-            data = request.json or {}
-            sse.broadcast(room_id, {
-                "type": "typing",
-                "username": user.username,
-                "is_typing": data.get("is_typing", False),
-            }, exclude=user.username)
+    post_typing(room_id, request.headers.get("Authorization",""), request.get_json(silent=True) or {})
     return "", 204
 
 if __name__ == "__main__":
-    print("⚡ Nexus Chat running on http://localhost:8000")
-    app.run(host="0.0.0.0", port=8000, threaded=True, debug=False)
+    PORT = int(os.getenv("PORT", 8000))
+    if "--async-sse" in sys.argv:
+        # API stays on Flask; /sse/* moves to the asyncio transport so idle
+        # subscribers cost a coroutine each instead of an OS thread.
+        from sse_async import AsyncSSEServer
+        sse_port = int(os.getenv("SSE_PORT", 8001))
+        threading.Thread(
+            target=app.run,
+            kwargs={"host": "0.0.0.0", "port": PORT, "threaded": True, "debug": False},
+            daemon=True,
+        ).start()
+        print(f"⚡ Nexus Chat API on http://localhost:{PORT}")
+        print(f"⚡ Async SSE on http://localhost:{sse_port}")
+        AsyncSSEServer().run("0.0.0.0", sse_port)
+    else:
+        print(f"⚡ Nexus Chat running on http://localhost:{PORT}")
+        app.run(host="0.0.0.0", port=PORT, threaded=True, debug=False)
@@ -0,0 +1,399 @@
+"""
+NEXUS CHAT — durable message log
+Append-only, segmented on-disk history per room, so a restart no longer
+loses every message and history is not limited by RAM.
+
+Layout (one directory per room under CHAT_LOG_DIR):
+  <first_seq>.seg  records: 4-byte big-endian length + JSON body
+                   {"op": "add", "seq": n, "m": {...message}} | {"op": "del", "seq": n}
+  <first_seq>.idx  16-byte (seq, offset) entries, one per "add" record, so any
+                   message is one mmap lookup away by its per-room seq
+  snapshot.json    recent window, deleted seqs and the log position it covers
+
+Startup loads each room's snapshot and replays only the records written
+after it, so recovery cost depends on the tail, not on total history.
+Older pages are read straight from the memory-mapped segments.
+
+Without a directory (CHAT_LOG_DIR unset) the same class runs memory-only:
+nothing is written and every message stays in the recent window, so the
+cursor reads below work either way.
+"""
+
+import os
+import json
+import mmap
+import time
+import atexit
+import struct
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import islice
+
+HEADER = struct.Struct(">I")
+IDX    = struct.Struct(">QQ")
+
+
+class RoomLog:
+    def __init__(self, path):
+        self.path = path
+        self.segments = []          # first seq of each segment, ascending
+        self.next_seq = 0
+        self.deleted = set()
+        self.recent = OrderedDict() # seq -> message, newest last
+        self.seq_of = {}            # message_id -> seq, recent window only
+        self.seg = self.idx = None  # active segment file handles
+        self.seg_size = 0
+        self.since_snapshot = 0
+        self.modified = time.time()   # last add/delete, for Last-Modified
+        self.maps = OrderedDict()   # sealed segment first seq -> (seg mmap, idx mmap)
+
+    def seg_path(self, first_seq, ext):
+        return os.path.join(self.path, f"{first_seq:020d}.{ext}")
+
+
+class MessageLog:
+    SEGMENT_BYTES  = 64 * 1024 * 1024
+    SNAPSHOT_EVERY = 1000   # records between snapshots
+    RECENT         = 500    # messages per room kept in memory
+    OPEN_MAPS      = 16     # sealed segments kept mapped per room
+
+    def __init__(self, root=None):
+        self.root = root
+        # Seeded from the clock like SSE event ids: a version handed out
+        # before a restart never matches one handed out after it.
+        self.epoch = time.time_ns() // 1000
+        self._lock = threading.Lock()
+        self._rooms = {}
+        if root is None:
+            return
+        os.makedirs(root, exist_ok=True)
+        for name in sorted(os.listdir(root)):
+            if os.path.isdir(os.path.join(root, name)):
+                self._rooms[name] = self._recover(name)
+        atexit.register(self.close)
+
+    # ── Recovery ──────────────────────────────────────────────────────────────
+
+    def _recover(self, room_id):
+        if self.root is None:
+            return RoomLog(None)
+        room = RoomLog(os.path.join(self.root, room_id))
+        os.makedirs(room.path, exist_ok=True)
+        room.segments = sorted(int(f[:-4]) for f in os.listdir(room.path) if f.endswith(".seg"))
+
+        snap = {"next_seq": 0, "segment": 0, "offset": 0, "deleted": [], "recent": []}
+        snap_path = os.path.join(room.path, "snapshot.json")
+        if os.path.exists(snap_path):
+            with open(snap_path) as f:
+                snap = json.load(f)
+        room.next_seq = snap["next_seq"]
+        room.deleted = set(snap["deleted"])
+        room.modified = snap.get("modified", room.modified)
+        for message in snap["recent"]:
+            room.recent[message["seq"]] = message
+            room.seq_of[message["message_id"]] = message["seq"]
+
+        if not room.segments:
+            room.segments = [room.next_seq]
+            self._open_active(room)
+            return room
+        for first in room.segments:
+            if first < snap["segment"]:
+                continue
+            start = snap["offset"] if first == snap["segment"] else 0
+            self._replay(room, first, start)
+        self._open_active(room)
+        return room
+
+    def _replay(self, room, first, offset):
+        seg_path, idx_path = room.seg_path(first, "seg"), room.seg_path(first, "idx")
+        with open(seg_path, "rb") as f:
+            data = f.read()
+        # The index may be ahead of (crash after idx write) or behind the
+        # replay point; cut it back and rewrite entries as we go.
+        with open(idx_path, "ab") as idx:
+            idx.truncate((room.next_seq - first) * IDX.size)
+            pos = offset
+            while pos + HEADER.size <= len(data):
+                (length,) = HEADER.unpack_from(data, pos)
+                end = pos + HEADER.size + length
+                if end > len(data):
+                    break
+                record = json.loads(data[pos + HEADER.size:end])
+                if record["op"] == "add":
+                    idx.write(IDX.pack(record["seq"], pos))
+                    self._remember(room, record["m"])
+                    room.next_seq = record["seq"] + 1
+                else:
+                    self._forget(room, record["seq"])
+                pos = end
+        if pos > offset:
+            room.modified = os.path.getmtime(seg_path)
+        if pos < len(data):
+            # Torn final record from a crash mid-write.
+            with open(seg_path, "r+b") as f:
+                f.truncate(pos)
+
+    def _open_active(self, room):
+        first = room.segments[-1]
+        room.seg = open(room.seg_path(first, "seg"), "a+b")
+        room.idx = open(room.seg_path(first, "idx"), "a+b")
+        room.seg_size = room.seg.tell()
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    def append(self, room_id, message):
+        """Persist a new message; returns the copy stored (with its seq)."""
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is None:
+                room = self._rooms[room_id] = self._recover(room_id)
+            seq = room.next_seq
+            room.next_seq += 1
+            message = {**message, "seq": seq}
+            if self.root is not None:
+                offset = self._write(room, {"op": "add", "seq": seq, "m": message})
+                room.idx.write(IDX.pack(seq, offset))
+                room.idx.flush()
+            self._remember(room, message)
+            self._after_write(room)
+            return message
+
+    def delete(self, room_id, message_id):
+        with self._lock:
+            room = self._rooms.get(room_id)
+            seq = self._seq_for(room, message_id, scan=True) if room else None
+            if seq is None or seq in room.deleted:
+                return False
+            if self.root is not None:
+                self._write(room, {"op": "del", "seq": seq})
+            self._forget(room, seq)
+            self._after_write(room)
+            return True
+
+    def seed(self, engine):
+        """Copy engine history for rooms the log has no directory for, so
+        cursor reads never hide messages that predate the log."""
+        for room in engine.get_all_rooms():
+            room_id = room["room_id"]
+            if self.has_room(room_id):
+                continue
+            pages, page = [], 1
+            while True:
+                result = engine.get_messages(room_id, page=page)
+                if not result.get("ok"):
+                    break
+                pages.append(result.get("messages", []))
+                if not result.get("has_more"):
+                    break
+                page += 1
+            with self._lock:
+                self._rooms[room_id] = self._recover(room_id)
+            # Pages run newest → oldest; append oldest first.
+            for messages in reversed(pages):
+                for message in messages:
+                    self.append(room_id, message)
+
+    def _write(self, room, record):
+        body = json.dumps(record, separators=(",", ":")).encode()
+        offset = room.seg_size
+        room.seg.write(HEADER.pack(len(body)) + body)
+        room.seg.flush()
+        room.seg_size += HEADER.size + len(body)
+        return offset
+
+    def _after_write(self, room):
+        room.modified = time.time()
+        if self.root is None:
+            return
+        room.since_snapshot += 1
+        if room.seg_size >= self.SEGMENT_BYTES:
+            room.seg.close()
+            room.idx.close()
+            room.segments.append(room.next_seq)
+            self._open_active(room)
+        if room.since_snapshot >= self.SNAPSHOT_EVERY:
+            self._snapshot(room)
+
+    def _remember(self, room, message):
+        room.recent[message["seq"]] = message
+        room.seq_of[message["message_id"]] = message["seq"]
+        while self.root is not None and len(room.recent) > self.RECENT:
+            _, old = room.recent.popitem(last=False)
+            room.seq_of.pop(old["message_id"], None)
+
+    def _forget(self, room, seq):
+        room.deleted.add(seq)
+        message = room.recent.pop(seq, None)
+        if message is not None:
+            room.seq_of.pop(message["message_id"], None)
+
+    def _snapshot(self, room):
+        os.fsync(room.seg.fileno())
+        os.fsync(room.idx.fileno())
+        snap = {
+            "next_seq": room.next_seq,
+            "segment": room.segments[-1],
+            "offset": room.seg_size,
+            "deleted": sorted(room.deleted),
+            "modified": room.modified,
+            "recent": list(room.recent.values()),
+        }
+        path = os.path.join(room.path, "snapshot.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(snap, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        room.since_snapshot = 0
+
+    def close(self):
+        with self._lock:
+            for room in self._rooms.values():
+                if room.seg and not room.seg.closed:
+                    self._snapshot(room)
+                    room.seg.close()
+                    room.idx.close()
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    def has_room(self, room_id):
+        return room_id in self._rooms
+
+    def rooms(self):
+        return list(self._rooms)
+
+    def _read(self, room, seq):
+        message = room.recent.get(seq)
+        if message is not None:
+            return message
+        first = room.segments[bisect_right(room.segments, seq) - 1]
+        if first == room.segments[-1]:
+            # Active segment is still growing: plain positional reads.
+            (_, offset) = IDX.unpack(os.pread(room.idx.fileno(), IDX.size,
+                                              (seq - first) * IDX.size))
+            (length,) = HEADER.unpack(os.pread(room.seg.fileno(), HEADER.size, offset))
+            body = os.pread(room.seg.fileno(), length, offset + HEADER.size)
+        else:
+            seg_map, idx_map = self._mapped(room, first)
+            (_, offset) = IDX.unpack_from(idx_map, (seq - first) * IDX.size)
+            (length,) = HEADER.unpack_from(seg_map, offset)
+            body = seg_map[offset + HEADER.size:offset + HEADER.size + length]
+        return json.loads(body)["m"]
+
+    def _mapped(self, room, first):
+        maps = room.maps.get(first)
+        if maps is None:
+            maps = tuple(
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                for f in (open(room.seg_path(first, "seg"), "rb"),
+                          open(room.seg_path(first, "idx"), "rb"))
+            )
+            room.maps[first] = maps
+            if len(room.maps) > self.OPEN_MAPS:
+                for m in room.maps.popitem(last=False)[1]:
+                    m.close()
+        room.maps.move_to_end(first)
+        return maps
+
+    def _seq_for(self, room, message_id, scan=False):
+        """seq of a message id in the recent window. With `scan`, an older
+        id is searched for newest first, so the cost is its distance from
+        the tail (undo targets a user's latest message), not room size."""
+        seq = room.seq_of.get(message_id)
+        if seq is None and scan:
+            for s in self._live_before(room, room.next_seq):
+                if s not in room.recent and self._read(room, s)["message_id"] == message_id:
+                    return s
+        return seq
+
+    def seq_for(self, room_id, message_id):
+        """seq of a message still in the room's recent window, else None."""
+        with self._lock:
+            room = self._rooms.get(room_id)
+            return room.seq_of.get(message_id) if room else None
+
+    def _live_before(self, room, seq):
+        while seq > 0:
+            seq -= 1
+            if seq not in room.deleted:
+                yield seq
+
+    def _live_after(self, room, seq):
+        for s in range(seq + 1, room.next_seq):
+            if s not in room.deleted:
+                yield s
+
+    def version(self, room_id):
+        """(version, modified) for conditional GETs. The version changes on
+        every add and delete in the room and on every restart; O(1)."""
+        room = self._rooms[room_id]
+        return f"{self.epoch}-{room.next_seq + len(room.deleted)}", room.modified
+
+    def page(self, room_id, before=None, after=None, limit=50):
+        """Cursor read: up to `limit` messages with a seq below `before`,
+        above `after`, or the newest ones — always returned oldest first.
+        Cursors are seqs (every message carries its own), so the cost is
+        O(limit) however deep the cursor. None if a cursor is out of range."""
+        with self._lock:
+            room = self._rooms[room_id]
+            if after is not None:
+                if not 0 <= after < room.next_seq:
+                    return None
+                seqs = self._live_after(room, after)
+            else:
+                seq = room.next_seq if before is None else before
+                if not 0 <= seq <= room.next_seq:
+                    return None
+                seqs = self._live_before(room, seq)
+            picked = [s for _, s in zip(range(limit), seqs)]
+            has_more = next(seqs, None) is not None
+            if after is None:
+                picked.reverse()
+            messages = [self._read(room, s) for s in picked]
+        return {"ok": True, "messages": messages, "has_more": has_more, "limit": limit}
+
+    def page_number(self, room_id, page=1, per_page=50):
+        """Legacy page-numbered read: page 1 is the newest `per_page`
+        messages, returned oldest first."""
+        with self._lock:
+            room = self._rooms[room_id]
+            seqs = self._live_before(room, room.next_seq)
+            for _ in range((page - 1) * per_page):
+                if next(seqs, None) is None:
+                    break
+            picked = [s for _, s in zip(range(per_page), seqs)]
+            has_more = next(seqs, None) is not None
+            messages = [self._read(room, s) for s in reversed(picked)]
+        return {"ok": True, "messages": messages, "has_more": has_more, "page": page}
+
+    def next_seq(self, room_id):
+        """seq the room's next message will get: everything below it is
+        already in the log."""
+        with self._lock:
+            room = self._rooms.get(room_id)
+            return room.next_seq if room else 0
+
+    def is_deleted(self, room_id, seq):
+        with self._lock:
+            return seq in self._rooms[room_id].deleted
+
+    def iter_messages(self, room_id, before=None, limit=None):
+        """Live messages below seq `before` (default: all of them), oldest
+        first; with `limit`, only the newest `limit`. The seqs are picked up
+        front, so appends made while iterating are not included."""
+        with self._lock:
+            room = self._rooms[room_id]
+            seqs = self._live_before(room, room.next_seq if before is None else before)
+            picked = list(islice(seqs, limit))
+        for seq in reversed(picked):
+            with self._lock:
+                if seq in room.deleted:
+                    continue
+                message = self._read(room, seq)
+            yield message
+
+
+def open_from_env():
+    return MessageLog(os.getenv("CHAT_LOG_DIR") or None)
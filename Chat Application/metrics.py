@@ -0,0 +1,203 @@
+"""
+NEXUS CHAT — metrics
+Prometheus text-format metrics without a client library: histograms and
+counters recorded in-process, gauges collected at scrape time.
+
+  GET /metrics    exposition format 0.0.4
+
+  nexus_http_request_seconds{method,route,status}   per-route latency
+  nexus_engine_op_seconds{op}                        every engine call
+  nexus_sse_fanout_seconds                           one event → all local queues
+  nexus_sse_publish_seconds                          broadcast() → backend publish
+  nexus_sse_queue_depth                              subscriber backlog after each put
+  nexus_sse_subscribers{room}                        gauge
+  nexus_sse_{coalesced,dropped,resyncs}_total{room}  backpressure counters
+  nexus_auth_cache_{hits,misses,evictions}_total     + nexus_auth_cache_hit_ratio
+
+With SERVER_TIMING=1 every API response also carries a Server-Timing
+header (`app;dur=…, engine;dur=…;desc="n calls"`) so a slow request
+shows where its time went straight from the browser's network panel.
+"""
+
+import os
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DEPTH_BUCKETS   = (0, 1, 2, 5, 10, 25, 50, 100)
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names, values, extra=""):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        self.name, self.help = name, help
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 3)
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def observe_many(self, values, *label_values):
+        """Several observations under one lock acquisition."""
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 3)
+            for value in values:
+                series[bisect_left(self.buckets, value)] += 1
+                series[-2] += value
+                series[-1] += 1
+
+    def time(self, *label_values):
+        return _Timer(self, label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for values, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), series):
+                cumulative += n
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, values)} {series[-1]}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "start")
+
+    def __init__(self, histogram, label_values):
+        self.histogram, self.label_values = histogram, label_values
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+
+def render_samples(name, kind, help, samples, labels=()):
+    """Lines for a gauge/counter family from [(label values, value), ...]."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{_labels(labels, values)} {value}" for values, value in samples]
+    return lines
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = []
+        self._collectors = []   # () -> list of exposition lines
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        h = Histogram(name, help, buckets, labels)
+        self._histograms.append(h)
+        return h
+
+    def collector(self, fn):
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for h in self._histograms:
+            lines += h.render()
+        for collect in self._collectors:
+            lines += collect()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_seconds = registry.histogram(
+    "nexus_http_request_seconds", "API request latency by route.",
+    labels=("method", "route", "status"))
+engine_seconds = registry.histogram(
+    "nexus_engine_op_seconds", "Time spent in engine calls.", labels=("op",))
+fanout_seconds = registry.histogram(
+    "nexus_sse_fanout_seconds", "Encoding one event and queueing it for every local subscriber.")
+publish_seconds = registry.histogram(
+    "nexus_sse_publish_seconds", "SSEManager.broadcast, including the backend publish.")
+queue_depth = registry.histogram(
+    "nexus_sse_queue_depth", "Subscriber backlog right after an event is queued.",
+    buckets=DEPTH_BUCKETS)
+
+
+# ── Per-request timing (Server-Timing) ────────────────────────────────────────
+
+_request = threading.local()
+
+def begin_request():
+    _request.start = time.perf_counter()
+    _request.engine = 0.0
+    _request.engine_calls = 0
+
+def end_request():
+    """Seconds since begin_request() and the engine time spent inside it."""
+    start = getattr(_request, "start", None)
+    if start is None:
+        return None, 0.0, 0
+    _request.start = None
+    return time.perf_counter() - start, _request.engine, _request.engine_calls
+
+def server_timing(elapsed, engine, calls):
+    return (f"app;dur={elapsed * 1000:.2f}, "
+            f'engine;dur={engine * 1000:.2f};desc="{calls} calls"')
+
+
+# ── Engine instrumentation ────────────────────────────────────────────────────
+
+ENGINE_OPS = (
+    "register", "login", "logout", "get_user_by_token",
+    "set_online", "set_offline", "get_online_users", "get_notifications",
+    "get_all_rooms", "create_room", "join_room", "leave_room", "get_room_participants",
+    "get_messages", "send_message", "undo_last_message", "stats",
+)
+
+def instrument(engine, ops=ENGINE_OPS):
+    """Time every call to `ops` on this engine instance. Patched on the
+    instance, so every module holding the shared engine is covered."""
+    for op in ops:
+        method = getattr(engine, op, None)
+        if method is None or getattr(method, "_timed", False):
+            continue
+
+        def timed(*args, _method=method, _op=op, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                engine_seconds.observe(elapsed, _op)
+                if getattr(_request, "start", None) is not None:
+                    _request.engine += elapsed
+                    _request.engine_calls += 1
+
+        timed._timed = True
+        setattr(engine, op, wraps(method)(timed))
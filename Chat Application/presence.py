@@ -0,0 +1,157 @@
+"""
+NEXUS CHAT — connection-level presence
+Each open event stream is one connection. A user is online while any of
+their connections is alive and "in" a room while any connection to that
+room is, so a second tab no longer flips the first one offline.
+
+  • refcounts per (room, user) and per user; only 0 → 1 and 1 → 0
+    transitions produce events
+  • the 1 → 0 side is debounced by LINGER seconds: a tab reload or a
+    flapping connection reconnects inside the window and nobody sees a
+    user_left / user_joined pair
+  • streams heartbeat on every write; a connection silent for TTL seconds
+    is expired as if it had closed. Deadlines live on a hashed timing
+    wheel, so a heartbeat is one dict store and a tick only looks at the
+    slots that came due
+
+`notify(kind, room_id, user, conn)` receives "online", "offline", "join",
+"leave" and "expire" (a connection dropped by TTL) outside the lock.
+"""
+
+import time
+import threading
+
+
+class TimingWheel:
+    """Hashed wheel of SLOTS buckets, SLOT seconds each. Cancelling or
+    pushing a deadline out only touches `deadlines`; a bucket re-files
+    entries that are not due yet when it comes round."""
+
+    def __init__(self, slot, slots, now):
+        self.slot = slot
+        self.buckets = [set() for _ in range(slots)]
+        self.deadlines = {}
+        self._tick = int(now / slot)
+
+    def _file(self, key, deadline):
+        self.buckets[int(deadline / self.slot) % len(self.buckets)].add(key)
+
+    def schedule(self, key, deadline):
+        self.deadlines[key] = deadline
+        self._file(key, deadline)
+
+    def postpone(self, key, deadline):
+        if key in self.deadlines:
+            self.deadlines[key] = deadline
+
+    def cancel(self, key):
+        return self.deadlines.pop(key, None) is not None
+
+    def advance(self, now):
+        """Pop and return every key whose deadline is <= now. The current
+        slot is only partly elapsed, so it is swept again next time."""
+        due = []
+        target = int(now / self.slot)
+        # Never sweep more than one full turn, however long we slept.
+        start = max(self._tick, target - len(self.buckets) + 1)
+        for tick in range(start, target + 1):
+            bucket = self.buckets[tick % len(self.buckets)]
+            for key in list(bucket):
+                deadline = self.deadlines.get(key)
+                if deadline is None:
+                    bucket.discard(key)
+                elif deadline <= now:
+                    bucket.discard(key)
+                    del self.deadlines[key]
+                    due.append(key)
+                elif int(deadline / self.slot) % len(self.buckets) != tick % len(self.buckets):
+                    bucket.discard(key)
+                    self._file(key, deadline)
+        self._tick = target
+        return due
+
+
+class PresenceTracker:
+    TTL    = 60    # seconds without a heartbeat before a connection is dropped
+    LINGER = 5     # seconds a user stays listed after their last connection
+    SLOT   = 1     # timing-wheel resolution
+    SLOTS  = 64
+
+    def __init__(self, notify):
+        self._notify = notify
+        self._lock = threading.Lock()
+        self._conns = {}       # conn -> (room_id, user dict)
+        self._in_room = {}     # (room_id, username) -> open connections
+        self._online = {}      # username -> open connections
+        self._wheel = TimingWheel(self.SLOT, self.SLOTS, time.monotonic())
+        threading.Thread(target=self._run, name="presence", daemon=True).start()
+
+    def connect(self, conn, room_id, user):
+        now = time.monotonic()
+        events = []
+        with self._lock:
+            username = user["username"]
+            self._conns[conn] = (room_id, user)
+            self._wheel.schedule(("conn", conn), now + self.TTL)
+            self._online[username] = self._online.get(username, 0) + 1
+            if self._online[username] == 1 and not self._wheel.cancel(("offline", username)):
+                events.append(("online", None, user, None))
+            key = (room_id, username)
+            self._in_room[key] = self._in_room.get(key, 0) + 1
+            if self._in_room[key] == 1 and not self._wheel.cancel(("leave",) + key):
+                events.append(("join", room_id, user, None))
+        self._emit(events)
+
+    def heartbeat(self, conn):
+        with self._lock:
+            self._wheel.postpone(("conn", conn), time.monotonic() + self.TTL)
+
+    def disconnect(self, conn):
+        with self._lock:
+            self._release(conn, time.monotonic())
+
+    def _release(self, conn, now):
+        entry = self._conns.pop(conn, None)
+        if entry is None:
+            return False
+        room_id, user = entry
+        username = user["username"]
+        self._wheel.cancel(("conn", conn))
+        key = (room_id, username)
+        self._in_room[key] -= 1
+        if not self._in_room[key]:
+            del self._in_room[key]
+            self._wheel.schedule(("leave",) + key, now + self.LINGER)
+        self._online[username] -= 1
+        if not self._online[username]:
+            del self._online[username]
+            self._wheel.schedule(("offline", username), now + self.LINGER)
+        return True
+
+    def online(self):
+        with self._lock:
+            return list(self._online)
+
+    def _run(self):
+        while True:
+            time.sleep(self.SLOT)
+            self._emit(self.tick(time.monotonic()))
+
+    def tick(self, now):
+        """Expire silent connections and return the debounced events due."""
+        events = []
+        with self._lock:
+            for key in self._wheel.advance(now):
+                if key[0] == "conn":
+                    entry = self._conns.get(key[1])
+                    if entry and self._release(key[1], now):
+                        events.append(("expire", entry[0], entry[1], key[1]))
+                elif key[0] == "leave":
+                    events.append(("leave", key[1], {"username": key[2]}, None))
+                else:
+                    events.append(("offline", None, {"username": key[1]}, None))
+        return events
+
+    def _emit(self, events):
+        for kind, room_id, user, conn in events:
+            self._notify(kind, room_id, user, conn)
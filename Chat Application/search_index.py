@@ -0,0 +1,205 @@
+"""
+NEXUS CHAT — message search index
+Per-room inverted index maintained incrementally as messages are sent and
+undone, so /api/rooms/<id>/search no longer scans room history.
+
+  • terms are lowercase word tokens; a query matches messages containing
+    every query term
+  • postings are append-only parallel arrays of per-room sequence numbers
+    and term frequencies, so ranking never re-tokenizes a message
+  • a query intersects the posting arrays as sets (in C, not a Python
+    walk), so `total` is the exact number of live matches; the newest
+    MAX_CANDIDATES of them are ranked by idf-weighted term frequency plus a
+    recency boost, then paginated
+  • each room has its own lock, so a slow query in one room never holds up
+    send_message in another
+  • each room keeps at most `max_docs` messages; older ones are evicted and
+    their postings compacted lazily
+  • messages are indexed under their message-log seq, so a message loaded
+    from history and one sent live sort by when they were sent, and a
+    message_id already indexed is never added twice
+"""
+
+import os
+import re
+import math
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+class RoomIndex:
+    __slots__ = ("lock", "docs", "seq_of", "postings", "next_seq", "first_seq",
+                 "live_postings", "dead_postings")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.docs = {}          # seq -> message dict
+        self.seq_of = {}        # message_id -> seq
+        self.postings = {}      # term -> (array of seqs ascending, array of term counts)
+        self.next_seq = 0       # one past the newest seq indexed
+        self.first_seq = 0      # nothing below this is still indexed
+        self.live_postings = 0
+        self.dead_postings = 0  # postings entries whose doc is gone
+
+
+class SearchIndex:
+    MAX_CANDIDATES = 500     # newest matches considered for ranking
+    RECENCY_SCALE  = 1000    # messages; a match this old gets half the boost
+
+    def __init__(self, max_docs=200_000):
+        self.max_docs = max_docs
+        self._lock = threading.Lock()   # guards _rooms only
+        self._rooms = {}
+
+    def _room(self, room_id):
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is None:
+                room = self._rooms[room_id] = RoomIndex()
+            return room
+
+    # ── Maintenance ───────────────────────────────────────────────────────────
+
+    def add(self, room_id, message):
+        """Index a message under its log seq. History loaded after live
+        messages lands below them, so postings are kept in seq order."""
+        tf = Counter(tokenize(message.get("content")))
+        seq = message["seq"]
+        room = self._room(room_id)
+        with room.lock:
+            if message["message_id"] in room.seq_of:
+                return
+            room.next_seq = max(room.next_seq, seq + 1)
+            if not room.docs or seq < room.first_seq:
+                room.first_seq = seq
+            room.docs[seq] = message
+            room.seq_of[message["message_id"]] = seq
+            for term, n in tf.items():
+                postings = room.postings.get(term)
+                if postings is None:
+                    postings = room.postings[term] = (array("Q"), array("I"))
+                seqs, tfs = postings
+                if not seqs or seqs[-1] < seq:
+                    seqs.append(seq)
+                    tfs.append(n)
+                else:
+                    i = bisect_left(seqs, seq)
+                    seqs.insert(i, seq)
+                    tfs.insert(i, n)
+            room.live_postings += len(tf)
+            while len(room.docs) > self.max_docs:
+                while room.first_seq not in room.docs:
+                    room.first_seq += 1
+                self._drop(room, room.first_seq)
+            self._maybe_compact(room)
+
+    def remove(self, room_id, message_id):
+        with self._lock:
+            room = self._rooms.get(room_id)
+        if room is None:
+            return
+        with room.lock:
+            if message_id not in room.seq_of:
+                return
+            self._drop(room, room.seq_of[message_id])
+            self._maybe_compact(room)
+
+    def _drop(self, room, seq):
+        message = room.docs.pop(seq)
+        room.seq_of.pop(message["message_id"], None)
+        n = len(set(tokenize(message.get("content"))))
+        room.live_postings -= n
+        room.dead_postings += n
+
+    def _maybe_compact(self, room):
+        if room.dead_postings <= max(1024, room.live_postings):
+            return
+        docs = room.docs
+        for term, (seqs, tfs) in list(room.postings.items()):
+            keep = [i for i, seq in enumerate(seqs) if seq in docs]
+            if keep:
+                room.postings[term] = (array("Q", (seqs[i] for i in keep)),
+                                       array("I", (tfs[i] for i in keep)))
+            else:
+                del room.postings[term]
+        room.dead_postings = 0
+
+    def load_log(self, message_log):
+        """Index history recovered by message_log.MessageLog. Each room's
+        end is fixed before anything is read, and only the newest
+        `max_docs` messages below it are read, since older ones would be
+        evicted anyway; messages sent meanwhile are indexed live by add()."""
+        ends = {room_id: message_log.next_seq(room_id) for room_id in message_log.rooms()}
+        for room_id, end in ends.items():
+            for message in message_log.iter_messages(room_id, before=end, limit=self.max_docs):
+                self.add(room_id, message)
+                # An undo between the read and add() found nothing to remove.
+                if message_log.is_deleted(room_id, message["seq"]):
+                    self.remove(room_id, message["message_id"])
+
+    # ── Query ─────────────────────────────────────────────────────────────────
+
+    def search(self, room_id, query, page=1, per_page=20):
+        """Messages containing every term of `query`, best first. `total`
+        counts every live match; only the newest MAX_CANDIDATES are ranked
+        and paged, which `ranked` reports."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        empty = {"ok": True, "results": [], "total": 0, "ranked": 0,
+                 "page": page, "has_more": False}
+        with self._lock:
+            room = self._rooms.get(room_id)
+        if room is None or not terms:
+            return empty
+        with room.lock:
+            lists = [room.postings.get(t) for t in terms]
+            if not all(lists):
+                return empty
+            n_docs = max(len(room.docs), 1)
+            idf = [math.log(1 + n_docs / len(seqs)) for (seqs, _) in lists]
+            # Set operations run in C: live docs ∩ rarest list ∩ the rest.
+            by_size = sorted(lists, key=lambda p: len(p[0]))
+            matches = room.docs.keys() & by_size[0][0]
+            for seqs, _ in by_size[1:]:
+                if not matches:
+                    break
+                matches.intersection_update(seqs)
+            if len(matches) <= self.MAX_CANDIDATES:
+                candidates = matches
+            else:
+                # Newest first: the rarest list is already in seq order.
+                candidates = []
+                for seq in reversed(by_size[0][0]):
+                    if seq in matches:
+                        candidates.append(seq)
+                        if len(candidates) == self.MAX_CANDIDATES:
+                            break
+            newest = room.next_seq - 1
+
+            scored = []
+            for seq in candidates:
+                relevance = 0.0
+                for weight, (seqs, tfs) in zip(idf, lists):
+                    relevance += weight * (1 + math.log(tfs[bisect_left(seqs, seq)]))
+                recency = 1 / (1 + (newest - seq) / self.RECENCY_SCALE)
+                scored.append((relevance * (1 + recency), seq, room.docs[seq]))
+
+        scored.sort(key=lambda s: (s[0], s[1]), reverse=True)
+        start = (page - 1) * per_page
+        return {
+            "ok": True,
+            "results": [m for (_, _, m) in scored[start:start + per_page]],
+            "total": len(matches),
+            "ranked": len(scored),
+            "page": page,
+            "has_more": start + per_page < len(scored),
+        }
+
+
+search_index = SearchIndex(max_docs=int(os.getenv("SEARCH_INDEX_MAX_DOCS", 200_000)))
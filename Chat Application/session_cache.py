@@ -0,0 +1,96 @@
+"""
+NEXUS CHAT — session cache
+Bearer-token → user lookups sit on every API call, SSE connect and typing
+POST. SessionCache keeps recent results in an LRU with a TTL so the hot
+path is one dict hit instead of an engine lookup.
+
+Only successful lookups are cached, so a bad token never sticks. Logout
+must call invalidate(); the TTL bounds staleness for anything else that
+revokes a token behind the cache's back. A miss loads outside the lock,
+so invalidate() bumps a per-token generation that a load still in flight
+checks before storing: a logout racing a miss cannot re-cache the user.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from core.engine import engine
+
+
+class SessionCache:
+    def __init__(self, loader, ttl=60, maxsize=10_000):
+        self._loader = loader
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # token -> (expires_at, user), LRU order
+        self._loading = {}              # token -> [loads in flight, generation]
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, token):
+        if not token:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            loading = self._loading.setdefault(token, [0, 0])
+            loading[0] += 1
+            generation = loading[1]
+
+        try:
+            user = self._loader(token)
+        except BaseException:
+            with self._lock:
+                self._done_loading(token, loading)
+            raise
+        with self._lock:
+            self._done_loading(token, loading)
+            if user is None:
+                self._entries.pop(token, None)
+                return None
+            if loading[1] != generation:
+                return user    # invalidated mid-load: answer, but don't cache
+            self._entries[token] = (now + self.ttl, user)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return user
+
+    def _done_loading(self, token, loading):
+        # Called with the lock held.
+        loading[0] -= 1
+        if not loading[0]:
+            del self._loading[token]
+
+    def invalidate(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+            loading = self._loading.get(token)
+            if loading is not None:
+                loading[1] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+sessions = SessionCache(
+    lambda token: engine.get_user_by_token(token),   # late-bound for metrics.instrument
+    ttl=int(os.getenv("SESSION_CACHE_TTL", 60)),
+    maxsize=int(os.getenv("SESSION_CACHE_SIZE", 10_000)),
+)
@@ -0,0 +1,199 @@
+"""
+NEXUS CHAT — asyncio SSE transport
+Serves the same /sse/<room_id> and /sse/<room_id>/typing contract as the
+Flask routes, but every subscriber is a coroutine on one event loop instead
+of an OS thread blocked in q.get(). Idle streams cost a socket and a few KB,
+so one process can hold 10k+ subscribers (raise `ulimit -n` accordingly).
+
+Stdlib only. Subscriptions still go through streams.sse, so broadcasts from
+Flask worker threads reach async subscribers unchanged.
+"""
+
+import asyncio
+import json
+import queue as stdlib_queue
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from streams import (
+    Mailbox, HISTORY_SIZE, SSE_HEADERS, PING, PING_INTERVAL,
+    connected_event, stream_encoder, open_stream, close_stream, heartbeat,
+    post_typing,
+)
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES   = 16 * 1024
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type, Authorization",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+}
+
+REASONS = {200: "OK", 204: "No Content", 400: "Bad Request",
+           401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed"}
+
+# ─────────────────────────────────────────────
+# LOOP QUEUE — thread-safe producer, coroutine consumer
+# ─────────────────────────────────────────────
+class LoopQueue(Mailbox):
+    """Mailbox fed from any thread and drained by one coroutine.
+
+    Same coalescing/backpressure policy as the threaded Mailbox; only the
+    wake-up differs. The loop is woken only when the consumer is actually
+    waiting, and at most once per wait.
+    """
+
+    def __init__(self, loop, maxsize=HISTORY_SIZE):
+        super().__init__(maxsize)
+        self._loop = loop
+        self._waiter = None
+        self._wake_pending = False
+
+    def _notify(self):
+        # Called with the lock held, possibly from a Flask worker thread.
+        if self._waiter is None or self._wake_pending:
+            return
+        self._wake_pending = True
+        self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        with self._lock:
+            self._wake_pending = False
+            waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def close(self):
+        """Loop thread only: make a pending drain() raise ConnectionResetError."""
+        self.closed = True
+        self._wake()
+
+    async def drain(self, timeout):
+        deadline = self._loop.time() + timeout
+        while not self.closed:
+            with self._lock:
+                if self._items:
+                    return self._drain()
+                waiter = self._waiter = self._loop.create_future()
+            try:
+                await asyncio.wait_for(waiter, deadline - self._loop.time())
+            except TimeoutError:
+                raise stdlib_queue.Empty
+            finally:
+                with self._lock:
+                    self._waiter = None
+        raise ConnectionResetError("stream closed")
+
+# ─────────────────────────────────────────────
+# SERVER
+# ─────────────────────────────────────────────
+class AsyncSSEServer:
+    def run(self, host="0.0.0.0", port=8001):
+        asyncio.run(self.serve(host, port))
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(
+            self._handle, host, port, limit=MAX_HEADER_BYTES, backlog=4096,
+        )
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            method, path, query, headers = await self._read_head(reader)
+            parts = [unquote(p) for p in path.strip("/").split("/")]
+            if parts[0] != "sse" or len(parts) not in (2, 3):
+                await self._respond(writer, 404, {"error": "Not found"})
+            elif method == "OPTIONS":
+                await self._respond(writer, 204)
+            elif len(parts) == 2 and method == "GET":
+                last_event_id = (headers.get("last-event-id")
+                                 or query.get("last_event_id", [None])[0])
+                await self._stream(reader, writer, parts[1], query.get("token", [""])[0],
+                                   last_event_id, headers.get("accept-encoding"))
+            elif len(parts) == 3 and parts[2] == "typing" and method == "POST":
+                body = await self._read_body(reader, headers)
+                try:
+                    data = json.loads(body or b"{}")
+                except ValueError:
+                    data = {}
+                post_typing(parts[1], headers.get("authorization", ""),
+                            data if isinstance(data, dict) else {})
+                await self._respond(writer, 204)
+            else:
+                await self._respond(writer, 405, {"error": "Method not allowed"})
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _read_head(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                k, v = line.split(":", 1)
+                headers[k.strip().lower()] = v.strip()
+        url = urlsplit(target)
+        return method.upper(), url.path, parse_qs(url.query), headers
+
+    async def _read_body(self, reader, headers):
+        length = int(headers.get("content-length", 0) or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError("body too large")
+        return await reader.readexactly(length) if length else b""
+
+    def _head(self, status, headers):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        lines += [f"{k}: {v}" for k, v in {**CORS_HEADERS, **headers}.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _respond(self, writer, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        headers = {"Content-Length": len(data), "Connection": "close"}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        writer.write(self._head(status, headers) + data)
+        await writer.drain()
+
+    async def _stream(self, reader, writer, room_id, token,
+                      last_event_id=None, accept_encoding=None):
+        q = LoopQueue(asyncio.get_running_loop())
+        user, q = open_stream(room_id, token, q, last_event_id)
+        if not user:
+            await self._respond(writer, 401, {"error": "Unauthorized"})
+            return
+
+        # Browsers never send on an open EventSource, so EOF (or a reset)
+        # on the read side is the earliest signal that the client left.
+        async def watch_disconnect():
+            try:
+                await reader.read()
+            except ConnectionError:
+                pass
+            q.close()
+
+        watcher = asyncio.create_task(watch_disconnect())
+        extra_headers, encode = stream_encoder(accept_encoding)
+        try:
+            head = self._head(200, {"Content-Type": "text/event-stream",
+                                    **SSE_HEADERS, **extra_headers})
+            writer.write(head + encode(connected_event(user.username)))
+            await writer.drain()
+            while True:
+                try:
+                    frames = await q.drain(PING_INTERVAL)
+                except stdlib_queue.Empty:
+                    frames = PING
+                writer.write(encode(frames))
+                await writer.drain()
+                heartbeat(q)
+        except ConnectionError:
+            pass
+        finally:
+            watcher.cancel()
+            close_stream(room_id, user.username, q)
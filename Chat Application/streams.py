@@ -0,0 +1,356 @@
+"""
+NEXUS CHAT — SSE fan-out
+Room subscriptions, broadcast, and the connect/disconnect lifecycle of an
+event stream. Transport-agnostic: the Flask routes in main.py and the
+asyncio server in sse_async.py both drive streams through these helpers.
+"""
+
+import os
+import json
+import time
+import zlib
+import itertools
+import threading
+import queue as stdlib_queue
+from collections import deque
+
+from core.engine import engine
+from broker import LocalBackend, backend_from_env
+from session_cache import sessions
+from sync_journal import journal
+from typing_state import TypingAggregator
+from presence import PresenceTracker
+from metrics import fanout_seconds, publish_seconds, queue_depth
+
+# Sent instead of a replay when the events a client missed are gone, and
+# as a last resort to a subscriber that fell too far behind.
+RESYNC = f"data: {json.dumps({'type': 'resync'})}\n\n".encode()
+RESYNC_KEY = "resync"
+
+# Replay ring per room and subscriber mailbox capacity. They are the same
+# number so any gap still in the ring replays without overflowing into a
+# resync.
+HISTORY_SIZE = 256
+
+def coalesce_key(event_data):
+    """Events that a later event of the same key fully supersedes.
+
+    Typing snapshots and presence only matter in their latest state;
+    messages and deletions never coalesce (None)."""
+    kind = event_data.get("type")
+    if kind == "typing_snapshot":
+        return "typing"
+    if kind in ("user_joined", "user_left"):
+        return f"presence:{event_data.get('username')}"
+    return None
+
+# ─────────────────────────────────────────────
+# SUBSCRIBER MAILBOX — bounded, coalescing
+# ─────────────────────────────────────────────
+class Mailbox:
+    """Per-subscriber outbound queue with a backpressure policy.
+
+    When an event arrives for a slow consumer:
+      1. a pending event with the same coalesce key is replaced in place,
+      2. otherwise it is queued if there is room,
+      3. otherwise the oldest pending coalescable event is shed for it,
+      4. if the queue is nothing but messages, an incoming coalescable
+         event is itself dropped (messages are kept), and only an incoming
+         message discards the backlog for a single `resync` marker.
+    The subscriber is never unsubscribed for being slow.
+
+    put() returns (coalesced, dropped, resyncs) so the caller can keep
+    per-room counters.
+    """
+
+    def __init__(self, maxsize=HISTORY_SIZE):
+        self.maxsize = maxsize
+        self._items = deque()   # [key, payload] entries, oldest first
+        self._pending = {}      # coalesce key -> entry still in _items
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self.closed = False
+
+    def put(self, payload, key=None):
+        with self._lock:
+            result = self._put(payload, key)
+            self._notify()
+        return result
+
+    def _put(self, payload, key):
+        entry = self._pending.get(key) if key is not None else None
+        if entry is not None:
+            entry[1] = payload
+            return 1, 0, 0
+        dropped = resyncs = 0
+        if len(self._items) >= self.maxsize:
+            victim = next((e for e in self._items
+                           if e[0] is not None and e[0] != RESYNC_KEY), None)
+            if victim is not None:
+                self._items.remove(victim)
+                del self._pending[victim[0]]
+                dropped = 1
+            elif key is not None and key != RESYNC_KEY:
+                return 0, 1, 0
+            else:
+                dropped, resyncs = len(self._items) + 1, 1
+                self._items.clear()
+                self._pending.clear()
+                payload, key = RESYNC, RESYNC_KEY
+        entry = [key, payload]
+        self._items.append(entry)
+        if key is not None:
+            self._pending[key] = entry
+        return 0, dropped, resyncs
+
+    def _notify(self):
+        # Called with the lock held.
+        self._ready.notify()
+
+    def _drain(self):
+        # Everything pending as one buffer, so a burst is a single write.
+        frames = b"".join(payload for (_, payload) in self._items)
+        self._items.clear()
+        self._pending.clear()
+        return frames
+
+    def drain(self, timeout=None):
+        """Block until something is queued, then take all of it. Raises
+        ConnectionResetError once the mailbox is closed."""
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._items or self.closed, timeout):
+                raise stdlib_queue.Empty
+            if self.closed:
+                raise ConnectionResetError("stream closed")
+            return self._drain()
+
+    def close(self):
+        """Any thread: end the stream blocked in (or next entering) drain()."""
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+    def qsize(self):
+        return len(self._items)
+
+# ─────────────────────────────────────────────
+# SSE CONNECTION MANAGER
+# ─────────────────────────────────────────────
+class SSEManager:
+    """Per-room fan-out with a bounded replay buffer.
+
+    Broadcasts go out through a backend (see broker.py) so they reach
+    subscribers in every worker, then come back through _deliver().
+    Every event gets an id that only ever increases and is kept in a
+    per-room ring of the last HISTORY_SIZE events. A reconnect that presents
+    Last-Event-ID is replayed just the events it missed; if the gap has
+    already fallen out of the ring, or the id is newer than any event seen
+    here, it gets a single `resync` event instead.
+    """
+
+    HISTORY_SIZE = HISTORY_SIZE
+
+    def __init__(self, backend=None):
+        self._lock = threading.Lock()
+        self._room_clients = {}  # room_id -> list of (username, mailbox)
+        self._history = {}       # room_id -> deque of (event_id, exclude, key, payload)
+        self._evicted = {}       # room_id -> newest event_id pushed out of the ring
+        self._counters = {}      # room_id -> {"coalesced", "dropped", "resyncs"}
+        self._backend = backend or LocalBackend()
+        self._epoch = self._backend.start(self._deliver)
+        self._ids = itertools.count(self._epoch)
+        self._last_id = self._epoch - 1   # newest event id delivered here
+
+    def subscribe(self, room_id, username, q=None, last_event_id=None):
+        # The asyncio transport passes its own loop-aware Mailbox here.
+        if q is None:
+            q = Mailbox()
+        with self._lock:
+            # Replay under the lock so no broadcast can slip between the
+            # backlog and the live subscription.
+            if last_event_id is not None:
+                for key, payload in self._missed(room_id, username, last_event_id):
+                    self._count(room_id, *q.put(payload, key))
+            if room_id not in self._room_clients:
+                self._room_clients[room_id] = []
+            self._room_clients[room_id].append((username, q))
+        return q
+
+    def _missed(self, room_id, username, last_event_id):
+        history = self._history.get(room_id, ())
+        # An id from the future was issued by another id space (a switch
+        # between LocalBackend and broker rowids, a recreated broker DB):
+        # nothing here says what the client missed.
+        if (last_event_id < self._epoch or last_event_id > self._last_id
+                or last_event_id < self._evicted.get(room_id, 0)):
+            return [(RESYNC_KEY, RESYNC)]
+        return [(key, payload) for (event_id, exclude, key, payload) in history
+                if event_id > last_event_id and exclude != username]
+
+    def unsubscribe(self, room_id, username, q):
+        with self._lock:
+            clients = self._room_clients.get(room_id, [])
+            try:
+                clients.remove((username, q))
+            except ValueError:
+                pass
+
+    def broadcast(self, room_id, event_data, exclude=None):
+        with publish_seconds.time():
+            self._backend.publish(room_id, json.dumps(event_data), exclude,
+                                  coalesce_key(event_data))
+
+    def _deliver(self, room_id, data, exclude=None, key=None, event_id=None):
+        start = time.perf_counter()
+        with self._lock:
+            if event_id is None:
+                event_id = next(self._ids)
+            self._last_id = max(self._last_id, event_id)
+            # Encoded once here; every subscriber queues the same bytes.
+            payload = f"id: {event_id}\ndata: {data}\n\n".encode()
+            history = self._history.get(room_id)
+            if history is None:
+                history = self._history[room_id] = deque(maxlen=self.HISTORY_SIZE)
+            if len(history) == history.maxlen:
+                self._evicted[room_id] = history[0][0]
+            history.append((event_id, exclude, key, payload))
+            clients = list(self._room_clients.get(room_id, []))
+        totals = [0, 0, 0]
+        depths = []
+        for (uname, q) in clients:
+            if uname == exclude:
+                continue
+            for i, n in enumerate(q.put(payload, key)):
+                totals[i] += n
+            depths.append(q.qsize())
+        if any(totals):
+            with self._lock:
+                self._count(room_id, *totals)
+        queue_depth.observe_many(depths)
+        fanout_seconds.observe(time.perf_counter() - start)
+
+    def _count(self, room_id, coalesced, dropped, resyncs):
+        # Called with self._lock held.
+        c = self._counters.setdefault(room_id, {"coalesced": 0, "dropped": 0, "resyncs": 0})
+        c["coalesced"] += coalesced
+        c["dropped"] += dropped
+        c["resyncs"] += resyncs
+
+    def stats(self):
+        """Per-room subscriber count, queue depth and backpressure counters."""
+        with self._lock:
+            rooms = {room_id: list(clients) for room_id, clients in self._room_clients.items()}
+            counters = {room_id: dict(c) for room_id, c in self._counters.items()}
+        out = {}
+        for room_id in rooms.keys() | counters.keys():
+            depths = [q.qsize() for (_, q) in rooms.get(room_id, [])]
+            out[room_id] = {
+                "subscribers": len(depths),
+                "queue_depth": sum(depths),
+                "max_queue_depth": max(depths, default=0),
+                **counters.get(room_id, {"coalesced": 0, "dropped": 0, "resyncs": 0}),
+            }
+        return out
+
+sse = SSEManager(backend_from_env())
+
+# ─────────────────────────────────────────────
+# STREAM LIFECYCLE
+# ─────────────────────────────────────────────
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+    "Connection": "keep-alive",
+}
+
+PING = f"data: {json.dumps({'type': 'ping'})}\n\n".encode()
+PING_INTERVAL = 25
+
+# Per-stream gzip is opt-in: each compressor holds ~24 KB of zlib state,
+# which adds up at 10k idle subscribers.
+SSE_GZIP = os.getenv("SSE_GZIP", "false").lower() == "true"
+
+def connected_event(username):
+    return f"data: {json.dumps({'type': 'connected', 'username': username})}\n\n".encode()
+
+def stream_encoder(accept_encoding):
+    """Returns (extra_headers, encode) for one stream.
+
+    With gzip every write is sync-flushed so events are not held back in
+    the compressor; the shared window still compresses repeated JSON keys
+    across events well."""
+    if SSE_GZIP and "gzip" in (accept_encoding or ""):
+        z = zlib.compressobj(6, zlib.DEFLATED, 16 + 12, 4)
+        return ({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+                lambda frames: z.compress(frames) + z.flush(zlib.Z_SYNC_FLUSH))
+    return {}, lambda frames: frames
+
+def parse_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _presence_changed(kind, room_id, user, conn):
+    username = user["username"]
+    if kind == "online":
+        engine.set_online(username)
+        journal.user_online(user)
+    elif kind == "offline":
+        engine.set_offline(username)
+        journal.user_offline(username)
+    elif kind == "join":
+        sse.broadcast(room_id, {"type": "user_joined", **user}, exclude=username)
+    elif kind == "leave":
+        sse.broadcast(room_id, {"type": "user_left", "username": username})
+    elif kind == "expire":
+        # Closing makes the stream's drain() raise, so its generator or
+        # coroutine exits instead of pinging a connection nobody feeds.
+        sse.unsubscribe(room_id, username, conn)
+        loop = getattr(conn, "_loop", None)
+        if loop is None:
+            conn.close()
+        else:
+            # LoopQueue.close() must run on its event loop.
+            try:
+                loop.call_soon_threadsafe(conn.close)
+            except RuntimeError:
+                pass    # loop already shut down
+
+presence = PresenceTracker(_presence_changed)
+
+def open_stream(room_id, token, q=None, last_event_id=None):
+    """Authenticate, join, subscribe and count the connection towards the
+    user's presence. Returns (user, queue).
+
+    `last_event_id` (from the Last-Event-ID header or ?last_event_id=)
+    replays whatever the client missed while it was disconnected.
+    """
+    user = sessions.get(token)
+    if not user:
+        return None, None
+
+    username = user.username
+    engine.join_room(room_id, username)
+    journal.touch_room(room_id)
+    q = sse.subscribe(room_id, username, q, parse_event_id(last_event_id))
+    presence.connect(q, room_id, user.to_dict())
+    return user, q
+
+def heartbeat(q):
+    """Call after every successful write to the stream."""
+    presence.heartbeat(q)
+
+def close_stream(room_id, username, q):
+    sse.unsubscribe(room_id, username, q)
+    presence.disconnect(q)
+
+typing = TypingAggregator(sse.broadcast)
+
+def post_typing(room_id, auth, data):
+    # Only recorded here; TypingAggregator broadcasts a per-room snapshot
+    # at most every INTERVAL seconds.
+    if auth.startswith("Bearer "):
+        user = sessions.get(auth.split(" ",1)[1])
+        if user:
+            typing.signal(room_id, user.username, bool(data.get("is_typing", False)))
@@ -0,0 +1,116 @@
+"""
+NEXUS CHAT — delta sync
+The sidebar used to poll /api/rooms and /api/users/online, rebuilding both
+lists for every client every few seconds. ChangeJournal numbers every room
+and presence change with a global version instead, so
+
+  GET /api/sync?since=<version>
+
+returns only what changed after `since` — and answers in O(1) when
+nothing did, which is what almost every idle client sees.
+
+  • a key ("room", id) / ("user", name) sits in `_changes` at the version
+    of its latest change, newest last; a delta walks back from the end
+  • room dicts are not kept here: changed rooms are re-read from the
+    engine once per version and reused by every client that asks
+  • the journal keeps at most MAX_CHANGES keys; a client whose `since` is
+    older than what was trimmed gets a full snapshot instead
+  • versions start at a boot epoch seeded from the clock, like SSE event
+    ids, so a version handed out before a restart is below the new epoch
+    (or, if the clock stepped back, above the current version) and its
+    client is sent a full snapshot rather than a wrong delta
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from core.engine import engine
+
+
+class ChangeJournal:
+    MAX_CHANGES = 10_000
+
+    def __init__(self, load_rooms):
+        self._load_rooms = load_rooms   # () -> list of room dicts
+        self._lock = threading.Lock()
+        self._epoch = time.time_ns() // 1000
+        self.version = self._epoch      # 0 is reserved for "send everything"
+        self._floor = self._epoch       # deltas from below this are gone
+        self._changes = OrderedDict()   # key -> version of its last change
+        self._online = {}               # username -> user dict (or None once offline)
+        self._rooms = (-1, {})          # (version read at, {room_id: room})
+
+    # ── Recording ─────────────────────────────────────────────────────────────
+
+    def _bump(self, key):
+        self.version += 1
+        self._changes[key] = self.version
+        self._changes.move_to_end(key)
+        while len(self._changes) > self.MAX_CHANGES:
+            (kind, name), version = self._changes.popitem(last=False)
+            self._floor = version
+            if kind == "user" and self._online.get(name) is None:
+                self._online.pop(name, None)
+
+    def touch_room(self, room_id):
+        """A room was created or its members changed."""
+        with self._lock:
+            self._bump(("room", room_id))
+
+    def user_online(self, user):
+        with self._lock:
+            if self._online.get(user["username"]) != user:
+                self._online[user["username"]] = user
+                self._bump(("user", user["username"]))
+
+    def user_offline(self, username):
+        with self._lock:
+            if self._online.get(username) is not None:
+                self._online[username] = None
+                self._bump(("user", username))
+
+    # ── Query ─────────────────────────────────────────────────────────────────
+
+    def _current_rooms(self):
+        read_at, rooms = self._rooms
+        if read_at != self.version:
+            rooms = {r["room_id"]: r for r in self._load_rooms()}
+            self._rooms = (self.version, rooms)
+        return rooms
+
+    def since(self, since=0):
+        """Changes after version `since`. `full` means the lists are the
+        whole state, not a delta, and the client should replace its own."""
+        with self._lock:
+            result = {"version": self.version, "full": False,
+                      "rooms": [], "rooms_removed": [], "online": [], "offline": []}
+            if since == self.version:
+                return result
+            if since < self._floor or since > self.version:
+                rooms = self._current_rooms()
+                result.update(full=True, rooms=list(rooms.values()),
+                              online=[u for u in self._online.values() if u])
+                return result
+
+            room_ids = []
+            for (kind, name), version in reversed(self._changes.items()):
+                if version <= since:
+                    break
+                if kind == "room":
+                    room_ids.append(name)
+                elif self._online.get(name):
+                    result["online"].append(self._online[name])
+                else:
+                    result["offline"].append(name)
+            if room_ids:
+                rooms = self._current_rooms()
+                for room_id in room_ids:
+                    if room_id in rooms:
+                        result["rooms"].append(rooms[room_id])
+                    else:
+                        result["rooms_removed"].append(room_id)
+            return result
+
+
+journal = ChangeJournal(engine.get_all_rooms)
@@ -0,0 +1,77 @@
+"""Tests for presence timing and the search index."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from presence import TimingWheel
+from message_log import MessageLog
+from search_index import SearchIndex
+
+
+# ── TimingWheel tests ──────────────────────────────────────────────────────────
+
+def run_until_due(wheel, key, start, step=1.0, limit=200):
+    """Tick like the presence thread does; return the time `key` fired."""
+    now = start
+    while now < start + limit:
+        if key in wheel.advance(now):
+            return now
+        now += step
+    return None
+
+
+def test_wheel_mid_slot_deadline_fires_within_a_slot():
+    wheel = TimingWheel(1, 64, 100.2)
+    assert wheel.advance(100.2) == []
+    wheel.schedule("k", 105.7)
+    fired = run_until_due(wheel, "k", 101.2)
+    assert fired is not None and 105.7 <= fired < 105.7 + 1
+    print("✅ Wheel mid-slot deadline")
+
+
+def test_wheel_deadline_in_current_slot():
+    wheel = TimingWheel(1, 64, 10.0)
+    wheel.schedule("k", 10.8)
+    assert wheel.advance(10.5) == []
+    assert wheel.advance(10.9) == ["k"]
+    print("✅ Wheel deadline in current slot")
+
+
+def test_wheel_postpone_and_cancel():
+    wheel = TimingWheel(1, 64, 0.0)
+    wheel.schedule("a", 3.5)
+    wheel.schedule("b", 3.5)
+    wheel.postpone("a", 70.2)    # more than a full turn later
+    assert wheel.cancel("b")
+    assert run_until_due(wheel, "b", 1.0, limit=10) is None
+    fired = run_until_due(wheel, "a", 1.0, step=0.5)
+    assert 70.2 <= fired < 71.2
+    print("✅ Wheel postpone/cancel")
+
+
+# ── Search index tests ─────────────────────────────────────────────────────────
+
+def test_index_load_skips_live_messages():
+    log = MessageLog()
+    for i in range(10):
+        log.append("r", {"message_id": f"old{i}", "content": f"hello {i}"})
+    index = SearchIndex(max_docs=5)
+    # Sent before the loader reaches the room: indexed live, then seen again.
+    live = log.append("r", {"message_id": "live", "content": "hello live"})
+    index.add("r", live)
+    index.load_log(log)
+    result = index.search("r", "hello")
+    ids = [m["message_id"] for m in result["results"]]
+    assert result["total"] == 5
+    assert ids == ["live", "old9", "old8", "old7", "old6"]
+    index.remove("r", "live")
+    assert index.search("r", "live")["total"] == 0
+    print("✅ Index load skips live messages")
+
+
+if __name__ == "__main__":
+    test_wheel_mid_slot_deadline_fires_within_a_slot()
+    test_wheel_deadline_in_current_slot()
+    test_wheel_postpone_and_cancel()
+    test_index_load_skips_live_messages()
+    print("\n🎉 All tests passed!")
@@ -0,0 +1,73 @@
+"""
+NEXUS CHAT — typing-indicator aggregation
+Keystroke-driven typing signals are folded into per-room state and flushed
+as at most one compact snapshot per room per INTERVAL:
+
+  {"type": "typing_snapshot", "typing": ["ana", "bo"], "stopped": ["cy"]}
+
+`typing` is everyone currently typing in the room, `stopped` is who stopped
+(or went quiet for TTL seconds) since the last snapshot. Broadcast volume is
+O(active rooms) per tick instead of O(keystrokes × members).
+"""
+
+import time
+import threading
+
+
+class TypingAggregator:
+    INTERVAL = 0.5   # at most one snapshot per room per interval
+    TTL      = 6     # a typer with no fresh signal for this long is dropped
+    REFRESH  = 2     # re-announce active typers so client-side timers don't lapse
+
+    def __init__(self, publish):
+        self._publish = publish   # publish(room_id, event_data)
+        self._lock = threading.Lock()
+        self._typing = {}         # room_id -> {username: expires_at}
+        self._stopped = {}        # room_id -> set of usernames
+        self._dirty = set()
+        self._last_sent = {}      # room_id -> monotonic time of last snapshot
+        threading.Thread(target=self._run, name="typing-aggregator", daemon=True).start()
+
+    def signal(self, room_id, username, is_typing):
+        now = time.monotonic()
+        with self._lock:
+            typers = self._typing.setdefault(room_id, {})
+            if is_typing:
+                if username not in typers:
+                    self._dirty.add(room_id)
+                    self._stopped.get(room_id, set()).discard(username)
+                typers[username] = now + self.TTL
+            elif typers.pop(username, None) is not None:
+                self._stopped.setdefault(room_id, set()).add(username)
+                self._dirty.add(room_id)
+
+    def _run(self):
+        while True:
+            time.sleep(self.INTERVAL)
+            for room_id, event in self.tick(time.monotonic()):
+                self._publish(room_id, event)
+
+    def tick(self, now):
+        """Expire stale typers and return the (room_id, snapshot) pairs due."""
+        due = []
+        with self._lock:
+            for room_id in list(self._typing):
+                typers = self._typing[room_id]
+                for username, expires_at in list(typers.items()):
+                    if expires_at <= now:
+                        del typers[username]
+                        self._stopped.setdefault(room_id, set()).add(username)
+                        self._dirty.add(room_id)
+                refresh = typers and now - self._last_sent.get(room_id, 0) >= self.REFRESH
+                if room_id in self._dirty or refresh:
+                    due.append((room_id, {
+                        "type": "typing_snapshot",
+                        "typing": sorted(typers),
+                        "stopped": sorted(self._stopped.pop(room_id, ())),
+                    }))
+                    self._last_sent[room_id] = now
+                if not typers:
+                    del self._typing[room_id]
+                    self._last_sent.pop(room_id, None)
+            self._dirty.clear()
+        return due
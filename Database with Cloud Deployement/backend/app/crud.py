@@ -1,24 +1,90 @@
+import time
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert, update, delete, tuple_
 from app.models import Item
+from app import search
 from app.schemas import ItemCreate, ItemUpdate
 
+COUNT_TTL    = 10.0   # seconds a filtered total is reused by cursor pages
+IMPORT_CHUNK = 500    # rows per executemany INSERT (and commit) on import
+EXPORT_CHUNK = 500    # rows fetched per round trip from the export cursor
+_counts      = {}     # (category, completed) -> (total, expires); cleared on writes
 
-async def get_items(db: AsyncSession, skip: int = 0, limit: int = 50,
-                    category: str = None, completed: bool = None):
-    query = select(Item)
+
+def _filters(category: str = None, completed: bool = None) -> list:
+    conds = []
     if category:
-        query = query.where(Item.category == category)
+        conds.append(Item.category == category)
     if completed is not None:
-        query = query.where(Item.completed == completed)
-    query = query.offset(skip).limit(limit).order_by(Item.created_at.desc())
-    result = await db.execute(query)
-    return result.scalars().all()
+        conds.append(Item.completed == completed)
+    return conds
+
+
+async def count_items(db: AsyncSession, category: str = None, completed: bool = None):
+    result = await db.execute(select(func.count()).select_from(Item)
+                              .where(*_filters(category, completed)))
+    total = result.scalar()
+    _counts[(category, completed)] = (total, time.monotonic() + COUNT_TTL)
+    return total
+
+
+async def get_items_page(db: AsyncSession, limit: int = 50, category: str = None,
+                         completed: bool = None, after: tuple = None, skip: int = 0):
+    """One page of items, newest first, and the filtered total in the same
+    query; returns (items, total, more). `after` is the (created_at, id)
+    of the last item already seen, so a deep page is one range scan of
+    the listing index, not an offset walk.
 
+    The total is a scalar subquery over the filtered rows rather than a
+    window count: COUNT(*) OVER () materialises and re-sorts every match,
+    while the subquery counts straight off an index. Totals are cached
+    per filter for COUNT_TTL seconds, so paging on skips the count."""
+    key    = (category, completed)
+    conds  = _filters(category, completed)
+    cached = _counts.get(key)
+    if cached is None or cached[1] < time.monotonic():
+        total_col = select(func.count()).select_from(Item).where(*conds).scalar_subquery()
+    else:
+        total_col = None
+    query = select(Item) if total_col is None else select(Item, total_col)
+    query = query.where(*conds)
+    if after is not None:
+        query = query.where(tuple_(Item.created_at, Item.id) < tuple_(*after))
+    query = (query.order_by(Item.created_at.desc(), Item.id.desc())
+             .offset(skip).limit(limit + 1))
+    rows  = (await db.execute(query)).all()
+    items = [row[0] for row in rows]
+    if total_col is None:
+        total = cached[0]
+    elif rows:
+        total = rows[0][1]
+        _counts[key] = (total, time.monotonic() + COUNT_TTL)
+    else:
+        total = await count_items(db, category, completed)
+    return items[:limit], total, len(items) > limit
 
-async def count_items(db: AsyncSession):
-    result = await db.execute(select(func.count()).select_from(Item))
-    return result.scalar()
+
+async def search_items(db: AsyncSession, q: str, limit: int = 50, category: str = None,
+                       completed: bool = None, skip: int = 0):
+    """Items matching the text query `q`, best match first (newest first
+    among equals), and the filtered match count in the same query;
+    returns (items, total, more)."""
+    conds = _filters(category, completed)
+    hits  = search.matches(q).subquery()
+    count = search.matches(q).subquery()
+    total_col = (select(func.count()).select_from(Item).join(count, count.c.id == Item.id)
+                 .where(*conds).scalar_subquery())
+    query = (select(Item, total_col).join(hits, hits.c.id == Item.id).where(*conds)
+             .order_by(hits.c.rank, Item.created_at.desc(), Item.id.desc())
+             .offset(skip).limit(limit + 1))
+    rows  = (await db.execute(query)).all()
+    items = [row[0] for row in rows]
+    if rows:
+        total = rows[0][1]
+    else:
+        total = (await db.execute(select(func.count()).select_from(Item)
+                                  .join(count, count.c.id == Item.id).where(*conds))).scalar()
+    return items[:limit], total, len(items) > limit
 
 
 async def get_item(db: AsyncSession, item_id: int):
@@ -30,25 +96,74 @@ async def create_item(db: AsyncSession, item: ItemCreate):
     db_item = Item(**item.model_dump())
     db.add(db_item)
     await db.commit()
+    _counts.clear()
     await db.refresh(db_item)
     return db_item
 
 
+def _returning(db: AsyncSession, kind: str) -> bool:
+    """Whether the bound dialect supports UPDATE/DELETE ... RETURNING
+    (Postgres, SQLite >= 3.35, MariaDB for DELETE)."""
+    return getattr(db.get_bind().dialect, f"{kind}_returning", False)
+
+
+async def create_items(db: AsyncSession, items: list[ItemCreate]) -> int:
+    """Insert a chunk of items with one executemany INSERT and commit it."""
+    if not items:
+        return 0
+    await db.execute(insert(Item), [item.model_dump() for item in items])
+    await db.commit()
+    _counts.clear()
+    return len(items)
+
+
+async def stream_items(db: AsyncSession, category: str = None, completed: bool = None):
+    """Every matching item as a plain row mapping, in id order, from a
+    server-side cursor read EXPORT_CHUNK rows at a time. Rows skip the
+    ORM, so nothing accumulates in the session however many there are."""
+    query = (select(Item.__table__).where(*_filters(category, completed))
+             .order_by(Item.id).execution_options(yield_per=EXPORT_CHUNK))
+    result = await db.stream(query)
+    async for row in result.mappings():
+        yield row
+
+
 async def update_item(db: AsyncSession, item_id: int, item: ItemUpdate):
+    values = item.model_dump(exclude_unset=True)
+    if not values:
+        return await get_item(db, item_id)
+    if not _returning(db, "update"):
+        return await _update_item_fetch(db, item_id, values)
+    # One round trip: the row comes back from the UPDATE itself.
+    result = await db.execute(
+        update(Item).where(Item.id == item_id).values(**values).returning(Item)
+    )
+    db_item = result.scalar_one_or_none()
+    await db.commit()
+    _counts.clear()
+    return db_item
+
+
+async def _update_item_fetch(db: AsyncSession, item_id: int, values: dict):
     db_item = await get_item(db, item_id)
     if not db_item:
         return None
-    for key, val in item.model_dump(exclude_unset=True).items():
+    for key, val in values.items():
         setattr(db_item, key, val)
     await db.commit()
+    _counts.clear()
     await db.refresh(db_item)
     return db_item
 
 
 async def delete_item(db: AsyncSession, item_id: int) -> bool:
-    db_item = await get_item(db, item_id)
-    if not db_item:
-        return False
-    await db.delete(db_item)
+    stmt = delete(Item).where(Item.id == item_id)
+    if _returning(db, "delete"):
+        result  = await db.execute(stmt.returning(Item.id))
+        deleted = result.scalar_one_or_none() is not None
+    else:
+        result  = await db.execute(stmt)
+        deleted = result.rowcount > 0
     await db.commit()
-    return True
+    _counts.clear()
+    return deleted
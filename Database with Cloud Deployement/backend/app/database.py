@@ -7,6 +7,7 @@ and add Cloud SQL connector.
 """
 
 import os
+from sqlalchemy import DateTime
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
@@ -26,6 +27,29 @@ class Base(DeclarativeBase):
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips tables that already exist, indexes included.
+        await conn.run_sync(_create_indexes)
+        if conn.dialect.name == "sqlite":
+            await conn.run_sync(_normalise_timestamps)
+
+
+def _create_indexes(conn):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _normalise_timestamps(conn):
+    """SQLite keeps datetimes as text. Rows stamped by CURRENT_TIMESTAMP read
+    'YYYY-MM-DD HH:MM:SS', while SQLAlchemy binds '… HH:MM:SS.ffffff', so
+    text comparisons against bound values (the listing cursor) go wrong.
+    Pad the short form once; it sorts the same and means the same instant."""
+    for table in Base.metadata.sorted_tables:
+        for col in table.columns:
+            if isinstance(col.type, DateTime):
+                conn.exec_driver_sql(
+                    f"UPDATE {table.name} SET {col.name} = {col.name} || '.000000' "
+                    f"WHERE length({col.name}) = 19")
 
 
 async def get_db():
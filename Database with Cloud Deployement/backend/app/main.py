@@ -2,11 +2,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.database import init_db
+from app.search import init_search
 from app.routers import items
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await init_search()
     yield
 
 app = FastAPI(
@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, func
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Index, func
 from app.database import Base
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class Item(Base):
     __tablename__ = "items"
 
@@ -10,5 +15,17 @@ class Item(Base):
     description = Column(Text, default="")
     category    = Column(String(100), default="general")
     completed   = Column(Boolean, default=False)
-    created_at  = Column(DateTime(timezone=True), server_default=func.now())
+    # Set in Python so every row carries microseconds: the (created_at, id)
+    # listing cursor compares these values, and SQLite stores them as text.
+    created_at  = Column(DateTime(timezone=True), default=_utcnow, server_default=func.now())
     updated_at  = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Listing indexes, in the (created_at, id) order GET /api/items pages
+    # through: one for each filter combination, so both the page and the
+    # filtered count are range scans.
+    __table_args__ = (
+        Index("ix_items_listing", "created_at", "id"),
+        Index("ix_items_completed_listing", "completed", "created_at", "id"),
+        Index("ix_items_category_listing", "category", "created_at", "id"),
+        Index("ix_items_category_completed_listing", "category", "completed", "created_at", "id"),
+    )
@@ -1,24 +1,132 @@
+import json
+import base64
+from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
-from app.schemas import ItemCreate, ItemUpdate, ItemOut, ItemList
+from app.database import get_db, AsyncSessionLocal
+from app.schemas import (ItemCreate, ItemUpdate, ItemOut, ItemList,
+                         ImportLineError, ImportResult)
 from app import crud
 
 router = APIRouter()
 
+MAX_IMPORT_ERRORS = 100       # line errors reported back; the rest are only counted
+MAX_NDJSON_LINE   = 1 << 20   # bytes
+
+
+def _encode_cursor(item) -> str:
+    raw = json.dumps([item.created_at.isoformat(), item.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(item_id, int):
+            raise ValueError
+        return datetime.fromisoformat(created_at), item_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Search results are ordered by rank, which is not a stored column, so
+# their cursor is a position in the ranking rather than a row key.
+
+def _encode_search_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode().rstrip("=")
+
+
+def _decode_search_cursor(cursor: str) -> int:
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["offset"]
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError
+        return offset
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @router.get("", response_model=ItemList)
 async def list_items(
     skip:      int            = Query(default=0, ge=0),
-    limit:     int            = Query(default=50, le=200),
+    limit:     int            = Query(default=50, ge=1, le=200),
     category:  Optional[str]  = Query(default=None),
     completed: Optional[bool] = Query(default=None),
+    cursor:    Optional[str]  = Query(default=None),
+    q:         Optional[str]  = Query(default=None, min_length=1, max_length=200),
     db: AsyncSession = Depends(get_db),
 ):
-    items = await crud.get_items(db, skip, limit, category, completed)
-    total = await crud.count_items(db)
-    return ItemList(items=items, total=total)
+    """Items newest first. `total` counts every item matching the filters;
+    pass `next_cursor` back as `cursor` for the next page (`skip` still
+    works, but deep offsets get slower where cursors do not).
+
+    With `q`, items whose title or description match the text, best match
+    first, paged the same way: pass `next_cursor` back with the same `q`."""
+    if q:
+        offset = _decode_search_cursor(cursor) if cursor else skip
+        items, total, more = await crud.search_items(db, q, limit, category, completed, offset)
+        next_cursor = _encode_search_cursor(offset + len(items)) if more else None
+        return ItemList(items=items, total=total, next_cursor=next_cursor)
+    after = _decode_cursor(cursor) if cursor else None
+    items, total, more = await crud.get_items_page(db, limit, category, completed, after, skip)
+    next_cursor = _encode_cursor(items[-1]) if more else None
+    return ItemList(items=items, total=total, next_cursor=next_cursor)
+
+
+async def _ndjson_lines(request: Request):
+    """Lines of the request body as they arrive; only a partial line is buffered."""
+    buf = b""
+    async for chunk in request.stream():
+        *lines, buf = (buf + chunk).split(b"\n")
+        for line in lines:
+            yield line
+        if len(buf) > MAX_NDJSON_LINE:
+            raise HTTPException(status_code=413, detail="NDJSON line too long")
+    yield buf
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_items(request: Request, db: AsyncSession = Depends(get_db)):
+    """Bulk-create items from an NDJSON body, one ItemCreate per line.
+    Rows are inserted and committed IMPORT_CHUNK at a time as the body
+    streams in; invalid lines are skipped and reported by line number."""
+    imported, skipped, errors, batch = 0, 0, [], []
+    lineno = 0
+    async for line in _ndjson_lines(request):
+        lineno += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append(ItemCreate.model_validate_json(line))
+        except ValidationError as exc:
+            skipped += 1
+            if len(errors) < MAX_IMPORT_ERRORS:
+                errors.append(ImportLineError(line=lineno, error=exc.errors()[0]["msg"]))
+            continue
+        if len(batch) == crud.IMPORT_CHUNK:
+            imported += await crud.create_items(db, batch)
+            batch = []
+    imported += await crud.create_items(db, batch)
+    return ImportResult(imported=imported, skipped=skipped, errors=errors)
+
+
+@router.get("/export")
+async def export_items(
+    category:  Optional[str]  = Query(default=None),
+    completed: Optional[bool] = Query(default=None),
+):
+    """Every matching item as NDJSON, in id order, streamed from a
+    server-side cursor."""
+    async def lines():
+        # The response outlives request-scoped dependencies, so the
+        # stream opens its own session.
+        async with AsyncSessionLocal() as db:
+            async for row in crud.stream_items(db, category, completed):
+                yield ItemOut.model_validate(dict(row)).model_dump_json() + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.get("/{item_id}", response_model=ItemOut)
@@ -30,5 +30,17 @@ class ItemOut(BaseModel):
 
 
 class ItemList(BaseModel):
-    items: list[ItemOut]
-    total: int
+    items:       list[ItemOut]
+    total:       int
+    next_cursor: Optional[str] = None
+
+
+class ImportLineError(BaseModel):
+    line:  int
+    error: str
+
+
+class ImportResult(BaseModel):
+    imported: int
+    skipped:  int
+    errors:   list[ImportLineError]
@@ -0,0 +1,113 @@
+"""
+Full-text search over item titles and descriptions.
+
+SQLite (the default aiosqlite URL) gets an external-content FTS5 table,
+items_fts, ranked with bm25(); Postgres gets a generated, weighted
+tsvector column with a GIN index, ranked with ts_rank_cd(). In both cases
+the database keeps the index in step with the items table itself —
+triggers on SQLite, the generated column on Postgres — so creates,
+updates, deletes and bulk imports need nothing extra. Any other database,
+or an SQLite build without FTS5, falls back to an unranked LIKE scan.
+"""
+
+import re
+from typing import Optional
+from sqlalchemy import false, func, literal, literal_column, or_, select, table, column, text
+from app.database import engine
+from app.models import Item
+
+FTS5_SCHEMA = [
+    """CREATE VIRTUAL TABLE items_fts USING fts5(
+           title, description, content='items', content_rowid='id',
+           tokenize='porter unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN
+           INSERT INTO items_fts (rowid, title, description)
+           VALUES (new.id, new.title, new.description);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN
+           INSERT INTO items_fts (items_fts, rowid, title, description)
+           VALUES ('delete', old.id, old.title, old.description);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF title, description ON items BEGIN
+           INSERT INTO items_fts (items_fts, rowid, title, description)
+           VALUES ('delete', old.id, old.title, old.description);
+           INSERT INTO items_fts (rowid, title, description)
+           VALUES (new.id, new.title, new.description);
+       END""",
+    # Index whatever was in the table before the FTS table existed.
+    "INSERT INTO items_fts (items_fts) VALUES ('rebuild')",
+]
+
+TSVECTOR_SCHEMA = [
+    """ALTER TABLE items ADD COLUMN IF NOT EXISTS search_vector tsvector
+       GENERATED ALWAYS AS (
+           setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+           setweight(to_tsvector('english', coalesce(description, '')), 'B')
+       ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_items_search ON items USING GIN (search_vector)",
+]
+
+TITLE_WEIGHT = 4.0   # bm25 column weights: a title hit outranks a description hit
+BODY_WEIGHT  = 1.0
+
+_backend = "like"    # "fts5", "tsvector" or "like"; set by init_search()
+
+_fts = table("items_fts", column("rowid"))
+
+
+async def init_search():
+    """Create the text index for the current database, once, at startup."""
+    global _backend
+    async with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            for stmt in TSVECTOR_SCHEMA:
+                await conn.execute(text(stmt))
+            _backend = "tsvector"
+        elif engine.dialect.name == "sqlite":
+            _backend = await conn.run_sync(_init_fts5)
+
+
+def _init_fts5(conn) -> str:
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'items_fts'").first()
+    if exists:
+        return "fts5"
+    try:
+        conn.exec_driver_sql(FTS5_SCHEMA[0])
+    except Exception:
+        return "like"    # SQLite compiled without FTS5
+    for stmt in FTS5_SCHEMA[1:]:
+        conn.exec_driver_sql(stmt)
+    return "fts5"
+
+
+def _fts5_query(q: str) -> Optional[str]:
+    """User text as an FTS5 query: every word must match. Words are quoted,
+    so operators and stray quotes in the input are searched for, not parsed."""
+    words = re.findall(r"\w+", q)
+    return " ".join(f'"{w}"' for w in words) if words else None
+
+
+def matches(q: str):
+    """SELECT of (id, rank) for the items matching `q`; lower rank is a
+    better match. Each call builds a fresh statement, so it can be used
+    for both the page and its count in one query."""
+    if _backend == "fts5":
+        query = _fts5_query(q)
+        if query is None:
+            return select(Item.id, literal(0).label("rank")).where(false())
+        fts = literal_column("items_fts")
+        return (select(_fts.c.rowid.label("id"),
+                       func.bm25(fts, TITLE_WEIGHT, BODY_WEIGHT).label("rank"))
+                .select_from(_fts).where(fts.op("MATCH")(query)))
+    if _backend == "tsvector":
+        vector = literal_column("items.search_vector")
+        tsq    = func.websearch_to_tsquery("english", q)
+        return (select(Item.id, (-func.ts_rank_cd(vector, tsq)).label("rank"))
+                .where(vector.op("@@")(tsq)))
+    # The text is matched literally: % and _ in it are not wildcards.
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    return (select(Item.id, literal(0).label("rank"))
+            .where(or_(Item.title.ilike(pattern, escape="\\"),
+                       Item.description.ilike(pattern, escape="\\"))))
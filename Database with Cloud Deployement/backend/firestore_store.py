@@ -0,0 +1,287 @@
+"""
+Firestore task store
+────────────────────
+Cloud storage behind the db_* dispatch in main.py.
+
+  • one firestore.Client per process, created when the store is built at
+    startup — not per call — so requests reuse its channel and auth
+  • listings run entirely in the query — equality filters, array_contains
+    for tags, (created_at, id) ordering, limit and the keyset cursor — and
+    are streamed, so a request reads only the documents it returns
+    (composite indexes are in firestore.indexes.json)
+  • delete is a single write with an exists precondition: no read first
+  • update and toggle read the document once and write with a
+    last_update_time precondition, then return the merge of what was read
+    and what was written. Firestore writes don't echo the document back,
+    so this is one read + one write instead of read, write, re-read; a
+    concurrent change fails the precondition and the update is retried.
+  • summary counters (total / completed / per priority) live in
+    NUM_SHARDS shard documents under task_stats/<collection>/shards and
+    are incremented in the same atomic batch as the task write, so the
+    summary is one small read however many tasks exist. Delete therefore
+    reads the task first (to know what to decrement) and writes with a
+    last_update_time precondition like update does.
+  • the *_many bulk methods read with one get_all per chunk and write up
+    to CHUNK tasks plus one counter increment per atomic batch commit.
+"""
+
+from __future__ import annotations
+
+import random
+from typing import Callable, Iterable, Iterator
+
+MAX_RETRIES = 5
+NUM_SHARDS  = 10
+CHUNK       = 499     # task writes per batch; Firestore allows 500 with the counter
+PRIORITIES  = ("low", "medium", "high")
+
+
+def _contribution(task: dict) -> dict:
+    """What one task adds to the summary counters."""
+    return {"total": 1, "completed": int(bool(task.get("completed"))), task["priority"]: 1}
+
+def _summary(total: dict) -> dict:
+    return {
+        "total":       total["total"],
+        "completed":   total["completed"],
+        "by_priority": {p: total[p] for p in PRIORITIES},
+    }
+
+def _delta(old: dict | None, new: dict | None, into: dict | None = None) -> dict:
+    out = {} if into is None else into
+    for sign, task in ((-1, old), (1, new)):
+        if task is not None:
+            for field, n in _contribution(task).items():
+                out[field] = out.get(field, 0) + sign * n
+    return out
+
+def _chunks(items: list, size: int = CHUNK):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+class FirestoreStore:
+    def __init__(self, project: str = "", collection: str = "tasks", client=None):
+        from google.cloud import firestore
+        from google.api_core import exceptions
+        if client is None:
+            client = firestore.Client(project=project or None)
+        self._errors = exceptions
+        self._increment = firestore.Increment
+        self._filter = firestore.FieldFilter
+        self._desc   = firestore.Query.DESCENDING
+        self._client = client
+        self._col    = client.collection(collection)
+        self._shards = client.collection("task_stats").document(collection).collection("shards")
+
+    # ── CRUD ──────────────────────────────────────────────────────────────────
+
+    def create(self, data: dict) -> dict:
+        batch = self._client.batch()
+        batch.create(self._col.document(data["id"]), data)
+        self._count(batch, _delta(None, data))
+        batch.commit()
+        return data
+
+    def get(self, task_id: str) -> dict | None:
+        snap = self._col.document(task_id).get()
+        return snap.to_dict() if snap.exists else None
+
+    def query(self, completed: bool | None = None, priority: str | None = None,
+              tag: str | None = None, limit: int | None = None,
+              fields: Iterable[str] | None = None,
+              after: tuple | None = None) -> Iterator[dict]:
+        """Matching tasks newest first, streamed from Firestore. `fields`
+        projects each document down to those fields and drops the
+        ordering, which is all an aggregate needs. `after` is the
+        (created_at, id) of the last task already returned."""
+        q = self._col
+        if completed is not None:
+            q = q.where(filter=self._filter("completed", "==", completed))
+        if priority:
+            q = q.where(filter=self._filter("priority", "==", priority))
+        if tag:
+            q = q.where(filter=self._filter("tags", "array_contains", tag))
+        if fields:
+            q = q.select(list(fields))
+        else:
+            # Document id breaks created_at ties; the composite indexes
+            # already carry it implicitly in the same direction.
+            q = q.order_by("created_at", direction=self._desc)
+            q = q.order_by("__name__", direction=self._desc)
+            if after:
+                q = q.start_after({"created_at": after[0], "__name__": after[1]})
+        if limit:
+            q = q.limit(limit)
+        for snap in q.stream():
+            yield snap.to_dict()
+
+    def update(self, task_id: str, patch: dict) -> dict | None:
+        return self._modify(task_id, lambda current: patch)
+
+    def toggle(self, task_id: str, now: str) -> dict | None:
+        return self._modify(task_id, lambda current: {
+            "completed": not current["completed"], "updated_at": now,
+        })
+
+    def delete(self, task_id: str) -> bool:
+        ref = self._col.document(task_id)
+        for attempt in range(MAX_RETRIES):
+            snap = ref.get()
+            if not snap.exists:
+                return False
+            batch = self._client.batch()
+            batch.delete(ref, option=self._client.write_option(last_update_time=snap.update_time))
+            self._count(batch, _delta(snap.to_dict(), None))
+            try:
+                batch.commit()
+            except self._errors.NotFound:
+                return False
+            except self._errors.FailedPrecondition:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                continue
+            return True
+
+    # ── Bulk ──────────────────────────────────────────────────────────────────
+
+    def create_many(self, tasks: list[dict]) -> list[dict | None]:
+        """Create tasks in chunked batches; None marks a task whose batch failed."""
+        out = []
+        for _, chunk in _chunks(tasks):
+            batch, delta = self._client.batch(), {}
+            for task in chunk:
+                batch.create(self._col.document(task["id"]), task)
+                _delta(None, task, into=delta)
+            self._count(batch, delta)
+            try:
+                batch.commit()
+            except self._errors.GoogleAPICallError:
+                out += [None] * len(chunk)
+                continue
+            out += chunk
+        return out
+
+    def update_many(self, items: list[tuple[str, dict]]) -> list[dict | None]:
+        """Apply (task_id, patch) pairs; None marks a missing task. A chunk
+        whose preconditions fail, and repeated ids, fall back to update()."""
+        out, retry = [None] * len(items), []
+        for start, chunk in _chunks(items):
+            snaps = self._read_many(task_id for task_id, _ in chunk)
+            batch, delta, seen, written = self._client.batch(), {}, set(), []
+            for i, (task_id, patch) in enumerate(chunk, start):
+                snap = snaps.get(task_id)
+                if snap is None:
+                    continue
+                if task_id in seen:
+                    retry.append(i)
+                    continue
+                seen.add(task_id)
+                current, updated = snap.to_dict(), {**snap.to_dict(), **patch}
+                batch.update(snap.reference, patch,
+                             option=self._client.write_option(last_update_time=snap.update_time))
+                _delta(current, updated, into=delta)
+                written.append((i, updated))
+            if not written:
+                continue
+            self._count(batch, delta)
+            try:
+                batch.commit()
+            except (self._errors.FailedPrecondition, self._errors.NotFound):
+                retry += [i for i, _ in written]
+                continue
+            for i, updated in written:
+                out[i] = updated
+        for i in sorted(retry):
+            out[i] = self.update(*items[i])
+        return out
+
+    def delete_many(self, task_ids: list[str]) -> list[bool]:
+        out, retry = [False] * len(task_ids), []
+        for start, chunk in _chunks(task_ids):
+            snaps = self._read_many(chunk)
+            batch, delta, seen, written = self._client.batch(), {}, set(), []
+            for i, task_id in enumerate(chunk, start):
+                snap = snaps.get(task_id)
+                if snap is None or task_id in seen:
+                    continue
+                seen.add(task_id)
+                batch.delete(snap.reference,
+                             option=self._client.write_option(last_update_time=snap.update_time))
+                _delta(snap.to_dict(), None, into=delta)
+                written.append(i)
+            if not written:
+                continue
+            self._count(batch, delta)
+            try:
+                batch.commit()
+            except (self._errors.FailedPrecondition, self._errors.NotFound):
+                retry += written
+                continue
+            for i in written:
+                out[i] = True
+        for i in retry:
+            out[i] = self.delete(task_ids[i])
+        return out
+
+    def _read_many(self, task_ids) -> dict:
+        """id → snapshot for the tasks that exist, in one round trip."""
+        refs = [self._col.document(task_id) for task_id in dict.fromkeys(task_ids)]
+        return {snap.id: snap for snap in self._client.get_all(refs) if snap.exists}
+
+    # ── Summary counters ──────────────────────────────────────────────────────
+
+    def counts(self) -> dict:
+        """{"total", "completed", "by_priority"} from the counter shards."""
+        shards = [snap.to_dict() for snap in self._shards.stream()]
+        if not any(shard.get("seeded") for shard in shards):
+            return self.rebuild_counts()
+        total = {field: sum(shard.get(field, 0) for shard in shards)
+                 for field in ("total", "completed") + PRIORITIES}
+        return _summary(total)
+
+    def rebuild_counts(self) -> dict:
+        """Recount the collection into the shards. Runs once, the first time
+        the summary is read on a collection that predates the counters;
+        writes that land during the scan can be off by their own delta."""
+        total = {field: 0 for field in ("total", "completed") + PRIORITIES}
+        for task in self.query(fields=("completed", "priority")):
+            for field, n in _contribution(task).items():
+                total[field] = total.get(field, 0) + n
+        batch = self._client.batch()
+        for i in range(NUM_SHARDS):
+            base = total if i == 0 else dict.fromkeys(total, 0)
+            batch.set(self._shards.document(str(i)), {**base, "seeded": i == 0})
+        batch.commit()
+        return _summary(total)
+
+    def _count(self, batch, delta: dict) -> None:
+        delta = {field: n for field, n in delta.items() if n}
+        if delta:
+            shard = self._shards.document(str(random.randrange(NUM_SHARDS)))
+            batch.set(shard, {f: self._increment(n) for f, n in delta.items()}, merge=True)
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _modify(self, task_id: str, make_patch: Callable[[dict], dict]) -> dict | None:
+        """Read once, write the patch only if nobody wrote in between, and
+        return the resulting document without reading it back."""
+        ref = self._col.document(task_id)
+        for attempt in range(MAX_RETRIES):
+            snap = ref.get()
+            if not snap.exists:
+                return None
+            current = snap.to_dict()
+            patch   = make_patch(current)
+            batch   = self._client.batch()
+            batch.update(ref, patch, option=self._client.write_option(last_update_time=snap.update_time))
+            self._count(batch, _delta(current, {**current, **patch}))
+            try:
+                batch.commit()
+            except self._errors.NotFound:
+                return None
+            except self._errors.FailedPrecondition:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                continue
+            return {**current, **patch}
@@ -2,18 +2,26 @@
 Task Manager REST API
 ─────────────────────
 Deployed on Google Cloud Run.
-Uses Cloud Firestore for persistence (falls back to in-memory for local dev).
+Uses Cloud Firestore for persistence (falls back to in-memory for local dev,
+or to an SQLite file with USE_SQLITE=true).
 """
 
 import os
+import json
 import uuid
+import base64
 from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
+from memory_store import MemoryStore
+from firestore_store import FirestoreStore
+from sqlite_store import SQLiteStore
+
 # ── App ────────────────────────────────────────────────────────────────────────
 
 app = FastAPI(
@@ -30,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # ── Schemas ────────────────────────────────────────────────────────────────────
@@ -73,118 +82,182 @@ class Task(BaseModel):
     created_at:  str
     updated_at:  str
 
-# ── Storage (Firestore or in-memory) ──────────────────────────────────────────
+MAX_BATCH = 1000   # operations per /tasks:batch request
+
+class TaskPatch(TaskUpdate):
+    id: str
+
+class TaskBatchCreate(BaseModel):
+    tasks: list[TaskCreate] = Field(..., min_length=1, max_length=MAX_BATCH)
+
+class TaskBatchUpdate(BaseModel):
+    updates: list[TaskPatch] = Field(..., min_length=1, max_length=MAX_BATCH)
+
+class TaskBatchDelete(BaseModel):
+    ids: list[str] = Field(..., min_length=1, max_length=MAX_BATCH)
+
+class BatchItemResult(BaseModel):
+    id:     Optional[str]
+    status: int
+    task:   Optional[Task] = None
+    error:  Optional[str]  = None
+
+class BatchResult(BaseModel):
+    results: list[BatchItemResult]
+
+# ── Storage (Firestore, SQLite or in-memory) ──────────────────────────────────
 
 USE_FIRESTORE = os.getenv("USE_FIRESTORE", "false").lower() == "true"
+USE_SQLITE    = os.getenv("USE_SQLITE", "false").lower() == "true" and not USE_FIRESTORE
 PROJECT_ID    = os.getenv("GOOGLE_CLOUD_PROJECT", "")
+SQLITE_PATH   = os.getenv("SQLITE_PATH", "tasks.db")
 
-_store: dict = {}   # in-memory fallback
+_mem = MemoryStore()   # in-memory fallback, indexed by priority/completed/tag
+_fs  = FirestoreStore(PROJECT_ID) if USE_FIRESTORE else None   # one client per process
+_sql = SQLiteStore(SQLITE_PATH) if USE_SQLITE else None        # WAL file, survives restarts
+STORAGE = "firestore" if USE_FIRESTORE else "sqlite" if USE_SQLITE else "memory"
 
 def _now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
-# ── Firestore helpers ──────────────────────────────────────────────────────────
-
-def _get_col():
-    from google.cloud import firestore
-    db = firestore.Client(project=PROJECT_ID)
-    return db.collection("tasks")
-
-def _fs_create(data: dict) -> dict:
-    col = _get_col()
-    col.document(data["id"]).set(data)
-    return data
-
-def _fs_get(task_id: str) -> dict | None:
-    doc = _get_col().document(task_id).get()
-    return doc.to_dict() if doc.exists else None
-
-def _fs_list(completed: bool | None, priority: str | None, tag: str | None) -> list[dict]:
-    q = _get_col()
-    if completed is not None:
-        q = q.where("completed", "==", completed)
-    if priority:
-        q = q.where("priority", "==", priority)
-    docs = q.stream()
-    tasks = [d.to_dict() for d in docs]
-    if tag:
-        tasks = [t for t in tasks if tag in t.get("tags", [])]
-    return sorted(tasks, key=lambda t: t["created_at"], reverse=True)
-
-def _fs_update(task_id: str, patch: dict) -> dict | None:
-    ref = _get_col().document(task_id)
-    if not ref.get().exists:
-        return None
-    ref.update(patch)
-    return ref.get().to_dict()
-
-def _fs_delete(task_id: str) -> bool:
-    ref = _get_col().document(task_id)
-    if not ref.get().exists:
-        return False
-    ref.delete()
-    return True
-
-# ── In-memory helpers ──────────────────────────────────────────────────────────
-
-def _mem_list(completed: bool | None, priority: str | None, tag: str | None) -> list[dict]:
-    tasks = list(_store.values())
-    if completed is not None:
-        tasks = [t for t in tasks if t["completed"] == completed]
-    if priority:
-        tasks = [t for t in tasks if t["priority"] == priority]
-    if tag:
-        tasks = [t for t in tasks if tag in t.get("tags", [])]
-    return sorted(tasks, key=lambda t: t["created_at"], reverse=True)
-
 # ── CRUD dispatch ──────────────────────────────────────────────────────────────
 
 def db_create(data: dict) -> dict:
     if USE_FIRESTORE:
-        return _fs_create(data)
-    _store[data["id"]] = data
-    return data
+        return _fs.create(data)
+    if USE_SQLITE:
+        return _sql.create(data)
+    return _mem.create(data)
 
 def db_get(task_id: str) -> dict | None:
     if USE_FIRESTORE:
-        return _fs_get(task_id)
-    return _store.get(task_id)
-
-def db_list(completed=None, priority=None, tag=None) -> list[dict]:
+        return _fs.get(task_id)
+    if USE_SQLITE:
+        return _sql.get(task_id)
+    return _mem.get(task_id)
+
+def db_iter(completed=None, priority=None, tag=None, limit=None, fields=None, after=None):
+    """Matching tasks newest first, as a stream, starting after the
+    (created_at, id) key `after`. With `fields`, documents may be cut
+    down to those fields and come in no particular order."""
+    if USE_FIRESTORE:
+        return _fs.query(completed, priority, tag, limit, fields, after)
+    if USE_SQLITE:
+        return _sql.query(completed, priority, tag, limit, fields, after)
+    return _mem.query(completed, priority, tag, limit, fields, after)
+
+TASK_FIELDS = tuple(Task.model_fields)
+
+def _encode_cursor(task: dict) -> str:
+    raw = json.dumps([task["created_at"], task["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not (isinstance(created_at, str) and isinstance(task_id, str)):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return created_at, task_id
+
+def _json_array(tasks):
+    """Serialise tasks one by one, so nothing waits for the full list."""
+    yield "["
+    for i, task in enumerate(tasks):
+        yield ("," if i else "") + json.dumps({k: task.get(k) for k in TASK_FIELDS})
+    yield "]"
+
+def db_counts() -> dict:
     if USE_FIRESTORE:
-        return _fs_list(completed, priority, tag)
-    return _mem_list(completed, priority, tag)
+        return _fs.counts()
+    if USE_SQLITE:
+        return _sql.counts()
+    return _mem.counts()
 
 def db_update(task_id: str, patch: dict) -> dict | None:
     if USE_FIRESTORE:
-        return _fs_update(task_id, patch)
-    if task_id not in _store:
-        return None
-    _store[task_id].update(patch)
-    return _store[task_id]
+        return _fs.update(task_id, patch)
+    if USE_SQLITE:
+        return _sql.update(task_id, patch)
+    return _mem.update(task_id, patch)
 
 def db_delete(task_id: str) -> bool:
     if USE_FIRESTORE:
-        return _fs_delete(task_id)
-    if task_id not in _store:
-        return False
-    del _store[task_id]
-    return True
+        return _fs.delete(task_id)
+    if USE_SQLITE:
+        return _sql.delete(task_id)
+    return _mem.delete(task_id)
+
+def db_create_many(tasks: list[dict]) -> list[dict | None]:
+    if USE_FIRESTORE:
+        return _fs.create_many(tasks)
+    if USE_SQLITE:
+        return _sql.create_many(tasks)
+    return _mem.create_many(tasks)
+
+def db_update_many(items: list[tuple[str, dict]]) -> list[dict | None]:
+    if USE_FIRESTORE:
+        return _fs.update_many(items)
+    if USE_SQLITE:
+        return _sql.update_many(items)
+    return _mem.update_many(items)
+
+def db_delete_many(task_ids: list[str]) -> list[bool]:
+    if USE_FIRESTORE:
+        return _fs.delete_many(task_ids)
+    if USE_SQLITE:
+        return _sql.delete_many(task_ids)
+    return _mem.delete_many(task_ids)
+
+def db_toggle(task_id: str, now: str) -> dict | None:
+    if USE_FIRESTORE:
+        return _fs.toggle(task_id, now)
+    if USE_SQLITE:
+        return _sql.toggle(task_id, now)
+    task = _mem.get(task_id)
+    if task is None:
+        return None
+    return _mem.update(task_id, {"completed": not task["completed"], "updated_at": now})
 
 # ── Routes ─────────────────────────────────────────────────────────────────────
 
 @app.get("/health")
 def health():
-    return {"status": "ok", "storage": "firestore" if USE_FIRESTORE else "memory"}
-
-@app.get("/tasks", response_model=list[Task])
+    return {"status": "ok", "storage": STORAGE}
+
+# The listing is streamed by hand, so FastAPI cannot validate it against a
+# response_model; rows are written with exactly Task's fields instead, and
+# the schema below is documentation only.
+LIST_RESPONSES = {200: {
+    "model":       list[Task],
+    "description": "Matching tasks, newest first",
+    "headers":     {"X-Next-Cursor": {
+        "description": "`cursor` for the next page; absent on the last page",
+        "schema":      {"type": "string"},
+    }},
+}}
+
+@app.get("/tasks", responses=LIST_RESPONSES)
 def list_tasks(
     completed: Optional[bool] = Query(default=None),
     priority:  Optional[str]  = Query(default=None),
     tag:       Optional[str]  = Query(default=None),
+    limit:     Optional[int]  = Query(default=None, ge=1, le=1000),
+    cursor:    Optional[str]  = Query(default=None),
 ):
-    """List all tasks. Filter by completed, priority, or tag."""
-    return db_list(completed=completed, priority=priority, tag=tag)
+    """List tasks, newest first. Filter by completed, priority, or tag.
+
+    With `limit`, returns one page; when more remain, the X-Next-Cursor
+    response header holds the `cursor` for the next page."""
+    after = _decode_cursor(cursor) if cursor else None
+    if limit is None:
+        return StreamingResponse(_json_array(db_iter(completed, priority, tag, after=after)),
+                                 media_type="application/json")
+    page    = list(db_iter(completed, priority, tag, limit + 1, after=after))
+    headers = {"X-Next-Cursor": _encode_cursor(page[limit - 1])} if len(page) > limit else {}
+    return StreamingResponse(_json_array(page[:limit]), media_type="application/json",
+                             headers=headers)
 
 @app.get("/tasks/{task_id}", response_model=Task)
 def get_task(task_id: str):
@@ -195,8 +268,10 @@ def get_task(task_id: str):
 
 @app.post("/tasks", response_model=Task, status_code=201)
 def create_task(body: TaskCreate):
-    now  = _now()
-    task = {
+    return db_create(_new_task(body, _now()))
+
+def _new_task(body: TaskCreate, now: str) -> dict:
+    return {
         "id":          str(uuid.uuid4()),
         "title":       body.title,
         "description": body.description or "",
@@ -207,7 +282,43 @@ def create_task(body: TaskCreate):
         "created_at":  now,
         "updated_at":  now,
     }
-    return db_create(task)
+
+# ── Bulk routes ───────────────────────────────────────────────────────────────
+# Whole request is validated up front; results come back per item, in order.
+
+@app.post("/tasks:batch", response_model=BatchResult)
+def create_tasks_batch(body: TaskBatchCreate):
+    now   = _now()
+    tasks = db_create_many([_new_task(t, now) for t in body.tasks])
+    return {"results": [
+        {"id": t["id"], "status": 201, "task": t} if t else
+        {"id": None, "status": 500, "error": "Write failed"}
+        for t in tasks
+    ]}
+
+@app.patch("/tasks:batch", response_model=BatchResult)
+def update_tasks_batch(body: TaskBatchUpdate):
+    now   = _now()
+    items = []
+    for u in body.updates:
+        patch = {k: v for k, v in u.model_dump(exclude={"id"}).items() if v is not None}
+        patch["updated_at"] = now
+        items.append((u.id, patch))
+    updated = db_update_many(items)
+    return {"results": [
+        {"id": task_id, "status": 200, "task": t} if t else
+        {"id": task_id, "status": 404, "error": "Task not found"}
+        for (task_id, _), t in zip(items, updated)
+    ]}
+
+@app.delete("/tasks:batch", response_model=BatchResult)
+def delete_tasks_batch(body: TaskBatchDelete):
+    deleted = db_delete_many(body.ids)
+    return {"results": [
+        {"id": task_id, "status": 204} if ok else
+        {"id": task_id, "status": 404, "error": "Task not found"}
+        for task_id, ok in zip(body.ids, deleted)
+    ]}
 
 @app.put("/tasks/{task_id}", response_model=Task)
 def update_task(task_id: str, body: TaskUpdate):
@@ -220,10 +331,9 @@ def update_task(task_id: str, body: TaskUpdate):
 
 @app.patch("/tasks/{task_id}/complete", response_model=Task)
 def toggle_complete(task_id: str):
-    task = db_get(task_id)
-    if not task:
+    updated = db_toggle(task_id, _now())
+    if not updated:
         raise HTTPException(status_code=404, detail="Task not found")
-    updated = db_update(task_id, {"completed": not task["completed"], "updated_at": _now()})
     return updated
 
 @app.delete("/tasks/{task_id}", status_code=204)
@@ -233,12 +343,10 @@ def delete_task(task_id: str):
 
 @app.get("/tasks/stats/summary")
 def stats():
-    all_tasks = db_list()
-    total     = len(all_tasks)
-    done      = sum(1 for t in all_tasks if t["completed"])
-    by_prio   = {"low": 0, "medium": 0, "high": 0}
-    for t in all_tasks:
-        by_prio[t["priority"]] = by_prio.get(t["priority"], 0) + 1
+    counts  = db_counts()
+    total   = counts["total"]
+    done    = counts["completed"]
+    by_prio = {"low": 0, "medium": 0, "high": 0, **counts["by_priority"]}
     return {
         "total":      total,
         "completed":  done,
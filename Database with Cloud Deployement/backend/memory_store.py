@@ -0,0 +1,158 @@
+"""
+Indexed in-memory task store
+────────────────────────────
+Local-dev storage behind the db_* dispatch in main.py. Every task is keyed
+by (created_at, id), and each index is a list of those keys kept sorted,
+so a filtered listing walks one index newest-first instead of copying,
+filtering and sorting the whole store:
+
+  _order         all tasks
+  _by_priority   priority → keys
+  _by_completed  True/False → keys
+  _by_tag        tag → keys
+
+With several filters the smallest index is walked and the other filters
+are checked per task. A keyset cursor (`after`, the key of the last task
+already seen) is one bisect into that index, so deep pages cost the same
+as the first, and the summary counts are just index sizes.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from typing import Iterator
+
+
+def _key(task: dict) -> tuple:
+    return (task["created_at"], task["id"])
+
+def _remove(keys: list, key: tuple) -> None:
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+class MemoryStore:
+    def __init__(self):
+        self._lock         = threading.RLock()
+        self._tasks        = {}    # id → task
+        self._order        = []
+        self._by_priority  = {}
+        self._by_completed = {True: [], False: []}
+        self._by_tag       = {}
+
+    # ── Index maintenance ─────────────────────────────────────────────────────
+
+    def _indexes(self, task: dict) -> list[list]:
+        lists = [
+            self._order,
+            self._by_priority.setdefault(task["priority"], []),
+            self._by_completed[bool(task["completed"])],
+        ]
+        lists += [self._by_tag.setdefault(t, []) for t in set(task.get("tags") or [])]
+        return lists
+
+    def _index(self, task: dict) -> None:
+        key = _key(task)
+        for keys in self._indexes(task):
+            if not keys or keys[-1] < key:
+                keys.append(key)    # the usual case: newest task
+            else:
+                insort(keys, key)
+
+    def _unindex(self, task: dict) -> None:
+        key = _key(task)
+        for keys in self._indexes(task):
+            _remove(keys, key)
+        for tag in set(task.get("tags") or []):
+            if not self._by_tag.get(tag):
+                self._by_tag.pop(tag, None)
+
+    # ── CRUD ──────────────────────────────────────────────────────────────────
+
+    def create(self, task: dict) -> dict:
+        with self._lock:
+            old = self._tasks.get(task["id"])
+            if old is not None:
+                self._unindex(old)
+            self._tasks[task["id"]] = task
+            self._index(task)
+        return task
+
+    def get(self, task_id: str) -> dict | None:
+        return self._tasks.get(task_id)
+
+    def update(self, task_id: str, patch: dict) -> dict | None:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            self._unindex(task)
+            task.update(patch)
+            self._index(task)
+        return task
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if task is None:
+                return False
+            self._unindex(task)
+        return True
+
+    # ── Bulk (one pass under the lock) ────────────────────────────────────────
+
+    def create_many(self, tasks: list[dict]) -> list[dict]:
+        with self._lock:
+            return [self.create(task) for task in tasks]
+
+    def update_many(self, items: list[tuple[str, dict]]) -> list[dict | None]:
+        with self._lock:
+            # Copies: a later item for the same id must not rewrite this result.
+            return [task and dict(task) for task in
+                    (self.update(task_id, patch) for task_id, patch in items)]
+
+    def delete_many(self, task_ids: list[str]) -> list[bool]:
+        with self._lock:
+            return [self.delete(task_id) for task_id in task_ids]
+
+    # ── Queries ───────────────────────────────────────────────────────────────
+
+    def counts(self) -> dict:
+        """Summary counters, read straight off the index sizes."""
+        with self._lock:
+            return {
+                "total":       len(self._order),
+                "completed":   len(self._by_completed[True]),
+                "by_priority": {p: len(keys) for p, keys in self._by_priority.items()},
+            }
+
+    def query(self, completed: bool | None = None, priority: str | None = None,
+              tag: str | None = None, limit: int | None = None,
+              fields=None, after: tuple | None = None) -> Iterator[dict]:
+        """Matching tasks, newest first, starting below the (created_at, id)
+        key `after` if given. The page is collected under the lock; `fields`
+        is accepted for parity with FirestoreStore and ignored."""
+        with self._lock:
+            candidates = [self._order]
+            if completed is not None:
+                candidates.append(self._by_completed[bool(completed)])
+            if priority:
+                candidates.append(self._by_priority.get(priority, []))
+            if tag:
+                candidates.append(self._by_tag.get(tag, []))
+            keys = min(candidates, key=len)
+            end = bisect_left(keys, tuple(after)) if after else len(keys)
+            tasks = self._tasks
+            out = []
+            for i in range(end - 1, -1, -1):
+                task = tasks[keys[i][1]]
+                if completed is not None and task["completed"] != completed:
+                    continue
+                if priority and task["priority"] != priority:
+                    continue
+                if tag and tag not in task.get("tags", []):
+                    continue
+                out.append(task)
+                if len(out) == limit:
+                    break
+            return iter(out)
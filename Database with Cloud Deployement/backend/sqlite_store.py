@@ -0,0 +1,264 @@
+"""
+SQLite task store
+─────────────────
+Durable embedded storage behind the db_* dispatch in main.py, for
+single-instance deployments and local load tests: tasks survive a restart
+and no request leaves the process.
+
+  • one file in WAL mode with synchronous=NORMAL: readers never block the
+    writer and a commit is an append to the log, not a page rewrite
+  • one connection per thread (FastAPI runs sync routes on a thread pool);
+    writes take the lock up front with BEGIN IMMEDIATE
+  • tasks are keyed for listing by (created_at, id), with an index per
+    filter — (priority, …), (completed, …) and the plain order — so a
+    filtered page is one index range scan, newest first
+  • tags live in the task_tags join table keyed (tag, created_at, task_id),
+    so a tag listing walks that key in order instead of sorting; the task
+    row keeps its own JSON copy of the tags for reads
+  • the summary counters in task_stats are kept by triggers in the same
+    transaction as the task write, so the summary is five rows however
+    many tasks exist
+  • streamed listings read PAGE rows per query, each a fresh keyset query
+    on the current thread's connection, so no cursor is held open while
+    the response is being written
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+PAGE         = 500    # rows per query when streaming a listing
+BUSY_TIMEOUT = 5.0    # seconds a writer waits for the lock
+COLUMNS      = ("id", "title", "description", "priority", "completed",
+                "due_date", "tags", "created_at", "updated_at")
+PRIORITIES   = ("low", "medium", "high")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id          TEXT PRIMARY KEY,
+    title       TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    priority    TEXT NOT NULL,
+    completed   INTEGER NOT NULL DEFAULT 0,
+    due_date    TEXT,
+    tags        TEXT NOT NULL DEFAULT '[]',
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_by_created   ON tasks (created_at, id);
+CREATE INDEX IF NOT EXISTS tasks_by_priority  ON tasks (priority, created_at, id);
+CREATE INDEX IF NOT EXISTS tasks_by_completed ON tasks (completed, created_at, id);
+
+CREATE TABLE IF NOT EXISTS task_tags (
+    tag         TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    task_id     TEXT NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, created_at, task_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS task_tags_by_task ON task_tags (task_id);
+
+CREATE TABLE IF NOT EXISTS task_stats (
+    field       TEXT PRIMARY KEY,
+    n           INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS task_stats_insert AFTER INSERT ON tasks BEGIN
+    UPDATE task_stats SET n = n + 1
+     WHERE field IN ('total', NEW.priority) OR (field = 'completed' AND NEW.completed);
+END;
+CREATE TRIGGER IF NOT EXISTS task_stats_delete AFTER DELETE ON tasks BEGIN
+    UPDATE task_stats SET n = n - 1
+     WHERE field IN ('total', OLD.priority) OR (field = 'completed' AND OLD.completed);
+END;
+CREATE TRIGGER IF NOT EXISTS task_stats_update AFTER UPDATE OF priority, completed ON tasks BEGIN
+    UPDATE task_stats SET n = n - 1
+     WHERE field = OLD.priority OR (field = 'completed' AND OLD.completed);
+    UPDATE task_stats SET n = n + 1
+     WHERE field = NEW.priority OR (field = 'completed' AND NEW.completed);
+END;
+"""
+
+
+def _row(task: dict) -> tuple:
+    """A task dict as the tasks table stores it."""
+    values = dict(task, completed=int(bool(task.get("completed"))),
+                  tags=json.dumps(task.get("tags") or []))
+    return tuple(values.get(c) for c in COLUMNS)
+
+def _task(row: tuple) -> dict:
+    task = dict(zip(COLUMNS, row))
+    task["completed"] = bool(task["completed"])
+    task["tags"]      = json.loads(task["tags"])
+    return task
+
+
+class SQLiteStore:
+    def __init__(self, path: str = "tasks.db"):
+        # Every connection opens its own database for ":memory:", so a real
+        # file is required even in tests.
+        self._path  = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode = WAL")    # persistent: stored in the file
+        conn.executescript(SCHEMA)
+        with self._write() as conn:
+            seeded = conn.execute("SELECT count(*) FROM task_stats").fetchone()[0]
+            if not seeded:
+                self._rebuild_counts(conn)
+
+    # ── Connections ───────────────────────────────────────────────────────────
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # ── CRUD ──────────────────────────────────────────────────────────────────
+
+    def create(self, task: dict) -> dict:
+        with self._write() as conn:
+            self._insert(conn, [task])
+        return task
+
+    def get(self, task_id: str) -> dict | None:
+        return self._select(self._conn(), task_id)
+
+    def update(self, task_id: str, patch: dict) -> dict | None:
+        with self._write() as conn:
+            return self._update(conn, task_id, patch)
+
+    def toggle(self, task_id: str, now: str) -> dict | None:
+        with self._write() as conn:
+            conn.execute("UPDATE tasks SET completed = 1 - completed, updated_at = ? WHERE id = ?",
+                         (now, task_id))
+            return self._select(conn, task_id)
+
+    def delete(self, task_id: str) -> bool:
+        with self._write() as conn:
+            return conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,)).rowcount > 0
+
+    # ── Bulk (one transaction per call) ───────────────────────────────────────
+
+    def create_many(self, tasks: list[dict]) -> list[dict]:
+        with self._write() as conn:
+            self._insert(conn, tasks)
+        return tasks
+
+    def update_many(self, items: list[tuple[str, dict]]) -> list[dict | None]:
+        with self._write() as conn:
+            return [self._update(conn, task_id, patch) for task_id, patch in items]
+
+    def delete_many(self, task_ids: list[str]) -> list[bool]:
+        with self._write() as conn:
+            return [conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,)).rowcount > 0
+                    for task_id in task_ids]
+
+    # ── Queries ───────────────────────────────────────────────────────────────
+
+    def counts(self) -> dict:
+        """{"total", "completed", "by_priority"} from the trigger-kept counters."""
+        total = dict(self._conn().execute("SELECT field, n FROM task_stats").fetchall())
+        return {
+            "total":       total.get("total", 0),
+            "completed":   total.get("completed", 0),
+            "by_priority": {p: total.get(p, 0) for p in PRIORITIES},
+        }
+
+    def query(self, completed: bool | None = None, priority: str | None = None,
+              tag: str | None = None, limit: int | None = None,
+              fields: Iterable[str] | None = None,
+              after: tuple | None = None) -> Iterator[dict]:
+        """Matching tasks newest first, PAGE rows per query, starting below
+        the (created_at, id) key `after`. `fields` is accepted for parity
+        with FirestoreStore and ignored."""
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = PAGE if remaining is None else min(PAGE, remaining)
+            rows = self._page(completed, priority, tag, size, after)
+            for row in rows:
+                yield _task(row)
+            if len(rows) < size:
+                return
+            after = (rows[-1][COLUMNS.index("created_at")], rows[-1][0])
+            if remaining is not None:
+                remaining -= size
+
+    # ── Internals ─────────────────────────────────────────────────────────────
+
+    def _page(self, completed, priority, tag, size: int, after: tuple | None) -> list:
+        cols = ", ".join(f"t.{c}" for c in COLUMNS)
+        if tag:
+            # Walk the tag's (created_at, task_id) key; filters join in per row.
+            sql, key, args = [f"SELECT {cols} FROM task_tags g JOIN tasks t ON t.id = g.task_id",
+                              "WHERE g.tag = ?"], ("g.created_at", "g.task_id"), [tag]
+        else:
+            sql, key, args = [f"SELECT {cols} FROM tasks t", "WHERE 1"], ("t.created_at", "t.id"), []
+        if completed is not None:
+            sql.append("AND t.completed = ?")
+            args.append(int(completed))
+        if priority:
+            sql.append("AND t.priority = ?")
+            args.append(priority)
+        if after:
+            sql.append(f"AND ({key[0]}, {key[1]}) < (?, ?)")
+            args += list(after)
+        sql.append(f"ORDER BY {key[0]} DESC, {key[1]} DESC LIMIT ?")
+        args.append(size)
+        return self._conn().execute(" ".join(sql), args).fetchall()
+
+    def _select(self, conn: sqlite3.Connection, task_id: str) -> dict | None:
+        row = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM tasks WHERE id = ?",
+                           (task_id,)).fetchone()
+        return _task(row) if row else None
+
+    def _insert(self, conn: sqlite3.Connection, tasks: list[dict]) -> None:
+        conn.executemany(
+            f"INSERT INTO tasks ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            [_row(task) for task in tasks])
+        conn.executemany(
+            "INSERT OR IGNORE INTO task_tags (tag, created_at, task_id) VALUES (?, ?, ?)",
+            [(t, task["created_at"], task["id"]) for task in tasks for t in set(task.get("tags") or [])])
+
+    def _update(self, conn: sqlite3.Connection, task_id: str, patch: dict) -> dict | None:
+        """Write the patch and read the row back inside the caller's transaction."""
+        values = dict(zip(COLUMNS, _row(patch)))
+        fields = [c for c in COLUMNS if c in patch and c not in ("id", "created_at")]
+        if fields:
+            conn.execute(f"UPDATE tasks SET {', '.join(f'{c} = ?' for c in fields)} WHERE id = ?",
+                         [values[c] for c in fields] + [task_id])
+        task = self._select(conn, task_id)
+        if task is not None and "tags" in patch:
+            conn.execute("DELETE FROM task_tags WHERE task_id = ?", (task_id,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO task_tags (tag, created_at, task_id) VALUES (?, ?, ?)",
+                [(t, task["created_at"], task_id) for t in set(task["tags"])])
+        return task
+
+    def _rebuild_counts(self, conn: sqlite3.Connection) -> None:
+        """Seed task_stats from the table; only runs on a database without one."""
+        total = {"total": 0, "completed": 0, **dict.fromkeys(PRIORITIES, 0)}
+        for prio, done, n in conn.execute(
+                "SELECT priority, completed, count(*) FROM tasks GROUP BY priority, completed"):
+            total["total"] += n
+            total["completed"] += n if done else 0
+            total[prio] = total.get(prio, 0) + n
+        conn.executemany("INSERT INTO task_stats (field, n) VALUES (?, ?)", total.items())
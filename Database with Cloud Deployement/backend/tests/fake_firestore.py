@@ -0,0 +1,217 @@
+"""
+In-memory Firestore client
+──────────────────────────
+Just enough of google.cloud.firestore.Client for FirestoreStore to run
+without a project or the emulator — pass it as FirestoreStore(client=…).
+
+  • documents live in one dict keyed by their full path, each stored with
+    an update_time that a clock bumps on every write
+  • preconditions behave like Firestore's: a last_update_time option
+    fails with FailedPrecondition if the document was written since, and
+    an update or precondition on a missing document fails with NotFound
+  • a batch checks every write before applying any, so a failed commit
+    leaves nothing behind
+  • `before_commit` is a queue of callables; each commit first pops and
+    runs one, for simulating a writer that races the store
+  • `reads` and `commits` count what the store asked for
+"""
+
+from __future__ import annotations
+
+import copy
+import itertools
+
+from google.api_core import exceptions
+from google.cloud.firestore import Increment
+
+
+class _Option:
+    def __init__(self, last_update_time=None, exists=None):
+        self.last_update_time = last_update_time
+        self.exists           = exists
+
+
+class Snapshot:
+    def __init__(self, reference: "DocumentRef", data: dict | None, update_time: int | None):
+        self.reference   = reference
+        self.id          = reference.id
+        self.exists      = data is not None
+        self.update_time = update_time
+        self._data       = data
+
+    def to_dict(self) -> dict | None:
+        return copy.deepcopy(self._data)
+
+    def _get(self, field: str):
+        return self.id if field == "__name__" else self._data.get(field)
+
+
+# ── References and queries ────────────────────────────────────────────────────
+
+class Query:
+    def __init__(self, client: "FakeClient", path: str, filters=(), orders=(),
+                 fields=None, limit_=None, cursor=None):
+        self._client  = client
+        self._path    = path
+        self._filters = tuple(filters)
+        self._orders  = tuple(orders)
+        self._fields  = fields
+        self._limit   = limit_
+        self._cursor  = cursor
+
+    def _with(self, **changes) -> "Query":
+        state = dict(filters=self._filters, orders=self._orders, fields=self._fields,
+                     limit_=self._limit, cursor=self._cursor)
+        state.update(changes)
+        return Query(self._client, self._path, **state)
+
+    def where(self, *, filter) -> "Query":
+        return self._with(filters=self._filters + ((filter.field_path, filter.op_string, filter.value),))
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "Query":
+        return self._with(orders=self._orders + ((field, direction),))
+
+    def select(self, fields: list[str]) -> "Query":
+        return self._with(fields=list(fields))
+
+    def limit(self, n: int) -> "Query":
+        return self._with(limit_=n)
+
+    def start_after(self, values: dict) -> "Query":
+        return self._with(cursor=tuple(values[field] for field, _ in self._orders))
+
+    def stream(self):
+        snaps = [snap for snap in self._client._children(self._path) if self._matches(snap)]
+        for field, direction in reversed(self._orders):
+            snaps.sort(key=lambda snap: snap._get(field), reverse=direction == "DESCENDING")
+        if self._cursor is not None:
+            snaps = [snap for snap in snaps if self._after_cursor(snap)]
+        if self._limit is not None:
+            snaps = snaps[:self._limit]
+        self._client.reads += len(snaps)
+        for snap in snaps:
+            if self._fields is not None:
+                snap._data = {f: snap._data[f] for f in self._fields if f in snap._data}
+            yield snap
+
+    def _matches(self, snap: Snapshot) -> bool:
+        for field, op, value in self._filters:
+            current = snap._get(field)
+            if op == "==" and current != value:
+                return False
+            if op == "array_contains" and value not in (current or []):
+                return False
+        return True
+
+    def _after_cursor(self, snap: Snapshot) -> bool:
+        for (field, direction), value in zip(self._orders, self._cursor):
+            current = snap._get(field)
+            if current != value:
+                return current < value if direction == "DESCENDING" else current > value
+        return False
+
+
+class CollectionRef(Query):
+    def document(self, doc_id: str) -> "DocumentRef":
+        return DocumentRef(self._client, f"{self._path}/{doc_id}")
+
+
+class DocumentRef:
+    def __init__(self, client: "FakeClient", path: str):
+        self._client = client
+        self.path    = path
+        self.id      = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> CollectionRef:
+        return CollectionRef(self._client, f"{self.path}/{name}")
+
+    def get(self) -> Snapshot:
+        self._client.reads += 1
+        return self._client._snapshot(self)
+
+
+# ── Writes ────────────────────────────────────────────────────────────────────
+
+class WriteBatch:
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+        self._writes = []
+
+    def create(self, ref: DocumentRef, data: dict) -> None:
+        self._writes.append(("create", ref, data, None))
+
+    def set(self, ref: DocumentRef, data: dict, merge: bool = False) -> None:
+        self._writes.append(("merge" if merge else "set", ref, data, None))
+
+    def update(self, ref: DocumentRef, data: dict, option: _Option | None = None) -> None:
+        self._writes.append(("update", ref, data, option))
+
+    def delete(self, ref: DocumentRef, option: _Option | None = None) -> None:
+        self._writes.append(("delete", ref, None, option))
+
+    def commit(self) -> None:
+        client = self._client
+        if client.before_commit:
+            client.before_commit.pop(0)()
+        for kind, ref, _, option in self._writes:
+            stored = client.docs.get(ref.path)
+            if kind == "create" and stored is not None:
+                raise exceptions.AlreadyExists(ref.path)
+            if kind == "update" and stored is None:
+                raise exceptions.NotFound(ref.path)
+            if option is not None and option.last_update_time is not None:
+                if stored is None:
+                    raise exceptions.NotFound(ref.path)
+                if stored[1] != option.last_update_time:
+                    raise exceptions.FailedPrecondition(ref.path)
+        client.commits += 1
+        for kind, ref, data, _ in self._writes:
+            if kind == "delete":
+                client.docs.pop(ref.path, None)
+                continue
+            current = dict(client.docs[ref.path][0]) if kind in ("update", "merge") and ref.path in client.docs else {}
+            for field, value in data.items():
+                if isinstance(value, Increment):
+                    current[field] = current.get(field, 0) + value.value
+                else:
+                    current[field] = copy.deepcopy(value)
+            client.docs[ref.path] = (current, next(client._clock))
+
+
+class FakeClient:
+    def __init__(self):
+        self.docs          = {}     # path -> (data, update_time)
+        self.before_commit = []
+        self.reads         = 0
+        self.commits       = 0
+        self._clock        = itertools.count(1)
+
+    def collection(self, name: str) -> CollectionRef:
+        return CollectionRef(self, name)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def get_all(self, refs):
+        for ref in refs:
+            self.reads += 1
+            yield self._snapshot(ref)
+
+    @staticmethod
+    def write_option(**kwargs) -> _Option:
+        return _Option(**kwargs)
+
+    # Direct writes for tests, outside any store call.
+
+    def put(self, path: str, data: dict) -> None:
+        self.docs[path] = (copy.deepcopy(data), next(self._clock))
+
+    def _snapshot(self, ref: DocumentRef) -> Snapshot:
+        data, update_time = self.docs.get(ref.path, (None, None))
+        return Snapshot(ref, copy.deepcopy(data), update_time)
+
+    def _children(self, path: str):
+        prefix = path + "/"
+        for doc_path in list(self.docs):
+            if doc_path.startswith(prefix) and "/" not in doc_path[len(prefix):]:
+                yield self._snapshot(DocumentRef(self, doc_path))
@@ -0,0 +1,200 @@
+"""Tests for FirestoreStore against the in-memory client in fake_firestore."""
+
+import sys, os
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pytest
+from google.api_core import exceptions
+
+import firestore_store
+from fake_firestore import FakeClient
+from firestore_store import FirestoreStore
+
+
+def make_task(n, priority="medium", completed=False, tags=()):
+    stamp = f"2024-01-01T00:{n // 60:02d}:{n % 60:02d}"
+    return {
+        "id": f"t{n:03d}", "title": f"Task {n}", "description": "", "priority": priority,
+        "completed": completed, "due_date": None, "tags": list(tags),
+        "created_at": stamp, "updated_at": stamp,
+    }
+
+
+def make_store(*tasks):
+    client = FakeClient()
+    store = FirestoreStore(collection="tasks", client=client)
+    for task in tasks:
+        store.create(task)
+    return store, client
+
+
+def stored(client, task_id):
+    return client.docs[f"tasks/{task_id}"][0]
+
+
+def recount(store):
+    """What the counters should say, straight from the documents."""
+    return firestore_store._summary({
+        "total":     sum(1 for _ in store.query()),
+        "completed": sum(1 for t in store.query() if t["completed"]),
+        **{p: sum(1 for _ in store.query(priority=p)) for p in firestore_store.PRIORITIES},
+    })
+
+
+# ── CRUD round trips ───────────────────────────────────────────────────────────
+
+def test_update_returns_what_is_stored():
+    store, client = make_store(make_task(1))
+    result = store.update("t001", {"title": "Renamed", "priority": "high"})
+    assert result == stored(client, "t001")
+    assert result["title"] == "Renamed" and result["description"] == ""
+    assert store.get("t001") == result
+    assert store.update("missing", {"title": "x"}) is None
+
+
+def test_toggle_round_trip():
+    store, client = make_store(make_task(1))
+    result = store.toggle("t001", "2024-02-01T00:00:00")
+    assert result["completed"] is True
+    assert result == stored(client, "t001")
+    assert store.toggle("t001", "2024-02-02T00:00:00")["completed"] is False
+    assert store.toggle("missing", "2024-02-02T00:00:00") is None
+
+
+def test_delete_round_trip():
+    store, client = make_store(make_task(1), make_task(2))
+    assert store.delete("t001") is True
+    assert store.get("t001") is None
+    assert store.delete("t001") is False
+    assert [t["id"] for t in store.query()] == ["t002"]
+
+
+def test_query_is_newest_first_and_resumes_after_cursor():
+    store, _ = make_store(*(make_task(n, tags=["a"] if n % 2 else []) for n in range(1, 8)))
+    assert [t["id"] for t in store.query(limit=3)] == ["t007", "t006", "t005"]
+    assert [t["id"] for t in store.query(limit=3, after=("2024-01-01T00:00:05", "t005"))] == \
+        ["t004", "t003", "t002"]
+    assert [t["id"] for t in store.query(tag="a")] == ["t007", "t005", "t003", "t001"]
+
+
+# ── Precondition retries ───────────────────────────────────────────────────────
+
+def test_update_retries_after_concurrent_write():
+    store, client = make_store(make_task(1))
+    racer = {**make_task(1), "description": "written by someone else"}
+    client.before_commit.append(lambda: client.put("tasks/t001", racer))
+    result = store.update("t001", {"title": "Renamed"})
+    # The retry re-read the racer's write, so it is kept rather than overwritten.
+    assert result["description"] == "written by someone else"
+    assert result == stored(client, "t001")
+
+
+def test_toggle_retries_against_the_fresh_value():
+    store, client = make_store(make_task(1))
+    client.before_commit.append(lambda: client.put("tasks/t001", make_task(1, completed=True)))
+    assert store.toggle("t001", "2024-02-01T00:00:00")["completed"] is False
+    assert store.counts()["completed"] == 0
+
+
+def test_delete_retries_after_concurrent_write():
+    store, client = make_store(make_task(1))
+    client.before_commit.append(lambda: client.put("tasks/t001", make_task(1, priority="high")))
+    assert store.delete("t001") is True
+    assert store.get("t001") is None
+    assert store.counts() == recount(store)
+
+
+def test_update_gives_up_after_max_retries():
+    store, client = make_store(make_task(1))
+    client.before_commit.extend(
+        (lambda: client.put("tasks/t001", make_task(1))) for _ in range(firestore_store.MAX_RETRIES))
+    with pytest.raises(exceptions.FailedPrecondition):
+        store.update("t001", {"title": "Renamed"})
+
+
+def test_update_of_task_deleted_mid_write_returns_none():
+    store, client = make_store(make_task(1))
+    client.before_commit.append(lambda: client.docs.pop("tasks/t001"))
+    assert store.update("t001", {"title": "Renamed"}) is None
+
+
+# ── Summary counters ───────────────────────────────────────────────────────────
+
+def test_counters_follow_every_write():
+    store, _ = make_store(make_task(1), make_task(2, priority="high"), make_task(3, completed=True))
+    assert store.counts() == {"total": 3, "completed": 1,
+                              "by_priority": {"low": 0, "medium": 2, "high": 1}}
+    store.update("t001", {"priority": "low"})
+    store.toggle("t002", "2024-02-01T00:00:00")
+    store.delete("t003")
+    assert store.counts() == {"total": 2, "completed": 1,
+                              "by_priority": {"low": 1, "medium": 0, "high": 1}}
+
+
+def test_counts_rebuilds_a_collection_without_counters():
+    client = FakeClient()
+    for task in (make_task(1), make_task(2, completed=True), make_task(3, priority="low")):
+        client.put(f"tasks/{task['id']}", task)
+    store = FirestoreStore(collection="tasks", client=client)
+    assert store.counts() == {"total": 3, "completed": 1,
+                              "by_priority": {"low": 1, "medium": 2, "high": 0}}
+    # Seeded now: further writes increment the shards instead of rescanning.
+    store.create(make_task(4, priority="high"))
+    reads = client.reads
+    assert store.counts()["by_priority"]["high"] == 1
+    assert client.reads - reads <= firestore_store.NUM_SHARDS
+
+
+def test_failed_write_leaves_counters_alone():
+    store, client = make_store(make_task(1))
+    before = store.counts()
+    with pytest.raises(exceptions.AlreadyExists):
+        store.create(make_task(1))
+    assert store.counts() == before
+
+
+# ── Batch writes ───────────────────────────────────────────────────────────────
+
+def test_create_many_chunks_and_counts():
+    chunk = firestore_store.CHUNK
+    store, client = make_store(make_task(0))
+    tasks = [make_task(n, completed=n % 3 == 0) for n in range(1, chunk + 3)] + [make_task(0)]
+    result = store.create_many(tasks)
+    assert result[:chunk] == tasks[:chunk]
+    # The second chunk held a duplicate id, so that whole batch failed.
+    assert result[chunk:] == [None] * 3
+    assert store.get(tasks[chunk]["id"]) is None
+    assert client.commits == 2
+    assert store.counts() == recount(store)
+    assert store.counts()["total"] == chunk + 1
+
+
+def test_update_many_round_trip_and_repeated_ids():
+    store, client = make_store(*(make_task(n) for n in range(1, 5)))
+    result = store.update_many([("t001", {"priority": "high"}), ("missing", {"title": "x"}),
+                                ("t002", {"completed": True}), ("t001", {"title": "Again"})])
+    assert result[1] is None
+    assert result[0]["priority"] == "high" and result[2]["completed"] is True
+    # The repeated id is applied after the batch, on top of the first patch.
+    assert result[3] == stored(client, "t001")
+    assert result[3]["title"] == "Again" and result[3]["priority"] == "high"
+    assert store.counts() == recount(store)
+
+
+def test_update_many_retries_a_chunk_that_lost_a_race():
+    store, client = make_store(*(make_task(n) for n in range(1, 4)))
+    client.before_commit.append(lambda: client.put("tasks/t002", make_task(2, completed=True)))
+    result = store.update_many([(f"t00{n}", {"priority": "low"}) for n in range(1, 4)])
+    assert [t["priority"] for t in result] == ["low"] * 3
+    assert result[1]["completed"] is True
+    assert all(result[i] == stored(client, f"t00{i + 1}") for i in range(3))
+    assert store.counts() == recount(store)
+
+
+def test_delete_many_round_trip():
+    store, client = make_store(*(make_task(n) for n in range(1, 5)))
+    client.before_commit.append(lambda: client.put("tasks/t003", make_task(3, priority="high")))
+    assert store.delete_many(["t001", "missing", "t003", "t001"]) == [True, False, True, False]
+    assert [t["id"] for t in store.query()] == ["t004", "t002"]
+    assert store.counts() == recount(store)